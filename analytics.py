@@ -0,0 +1,106 @@
+from room_log import replay_frames
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+THROUGHPUT_BUCKET = 10  # Seconds per throughput bar
+CFD_STEP = 5  # Seconds between cumulative-flow points
+STATIONS = ("prepared", "builders", "built", "oven")
+BAKED_WASTE = ("undercooked", "burnt")  # Wasted pizzas that went through the oven
+
+
+class RoundTimeline:
+    """Station counts of one round, recorded every time the room's state changes."""
+    __slots__ = ("round", "start", "times", "prepared", "builders", "built", "oven",
+                 "completed", "wasted", "wasted_baked")
+
+    def __init__(self, round_number, start):
+        self.round = round_number
+        self.start = start
+        self.times = []
+        self.prepared = []
+        self.builders = []
+        self.built = []
+        self.oven = []
+        self.completed = []
+        self.wasted = []
+        self.wasted_baked = []
+
+    def record(self, timestamp, state):
+        # Works on a live GameState and on a replayed log state alike
+        self.times.append(timestamp - self.start)
+        self.prepared.append(len(state["prepared_ingredients"]))
+        self.builders.append(sum(len(player["builder_ingredients"]) for player in state["players"].values()))
+        self.built.append(len(state["built_pizzas"]))
+        self.oven.append(len(state["oven"]))
+        self.completed.append(len(state["completed_pizzas"]))
+        self.wasted.append(len(state["wasted_pizzas"]))
+        self.wasted_baked.append(sum(1 for pizza in state["wasted_pizzas"] if pizza.get("status") in BAKED_WASTE))
+
+
+def timeline_from_log(snapshot, entries, keys):
+    """Rebuilds a round's timeline from its round_snapshot and the frames logged after it."""
+    state = snapshot["state"]
+    timeline = RoundTimeline(state["round"], state["round_start_time"])
+    timeline.record(snapshot["ts"], state)
+    for ts, event, _, state in replay_frames(state, entries, keys):
+        if event == "state_patch":
+            timeline.record(ts, state)
+    return timeline
+
+
+def analyze(timeline, duration, lead_time_samples):
+    """Throughput, WIP per station, cumulative flow and cycle-time percentiles of a round.
+
+    Returns None when NumPy is not installed.
+    """
+    if np is None or not timeline.times:
+        return None
+    times = np.asarray(timeline.times)
+
+    def at(series, grid):
+        # Value in force at each grid time: the last change at or before it
+        index = np.searchsorted(times, grid, side="right") - 1
+        return np.asarray(series)[np.clip(index, 0, None)]
+
+    seconds = np.arange(0, duration + 1, dtype=float)
+    wip = {station: at(getattr(timeline, station), seconds) for station in STATIONS}
+
+    edges = np.arange(0, duration + THROUGHPUT_BUCKET, THROUGHPUT_BUCKET, dtype=float)
+    completed_at_edges = at(timeline.completed, np.minimum(edges, duration))
+
+    cfd_times = np.arange(0, duration + CFD_STEP, CFD_STEP, dtype=float).clip(None, duration)
+    completed = at(timeline.completed, cfd_times)
+    wasted = at(timeline.wasted, cfd_times)
+    done = completed + wasted
+    baked = at(timeline.oven, cfd_times) + completed + at(timeline.wasted_baked, cfd_times)
+    built = at(timeline.built, cfd_times) + at(timeline.oven, cfd_times) + done
+
+    lead = np.asarray([sample["lead_time"] for sample in lead_time_samples], dtype=float)
+    finished = np.asarray([sample["status"] == "completed" for sample in lead_time_samples], dtype=bool)
+    cycle = {"count": int(lead.size)}
+    for label, values in (("all", lead), ("completed", lead[finished])):
+        if values.size:
+            p50, p85, p95 = np.percentile(values, [50, 85, 95])
+            cycle[label] = {"mean": float(values.mean()), "p50": float(p50), "p85": float(p85), "p95": float(p95)}
+
+    return {
+        "round": timeline.round,
+        "duration": duration,
+        "throughput": {"bucket_size": THROUGHPUT_BUCKET, "completed": np.diff(completed_at_edges).tolist()},
+        "wip": {
+            "step": 1,
+            "average": {station: float(values.mean()) for station, values in wip.items()},
+            "peak": {station: int(values.max()) for station, values in wip.items()},
+            "series": {station: values.tolist() for station, values in wip.items()}
+        },
+        "cfd": {
+            "t": cfd_times.tolist(),
+            "built": built.tolist(),
+            "baked": baked.tolist(),
+            "done": done.tolist()
+        },
+        "cycle_time": cycle
+    }
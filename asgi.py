@@ -0,0 +1,20 @@
+# asgi.py: asyncio server mode, python-socketio's AsyncServer under uvicorn
+import os
+os.environ.setdefault("ASYNC_MODE", "asyncio")
+
+import uvicorn
+
+import main
+
+application = main.socketio.asgi_app()
+
+
+class Server(uvicorn.Server):
+    def handle_exit(self, sig, frame):
+        # Before uvicorn closes the sockets, so disconnects don't tear the rooms down
+        main.begin_shutdown()
+        super().handle_exit(sig, frame)
+
+
+if __name__ == "__main__":
+    Server(uvicorn.Config(application, host="0.0.0.0", port=10000)).run()  # Match Render.com's expected port
@@ -0,0 +1,87 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli  # Installed with Flask-Compress
+except ImportError:
+    brotli = None
+
+ASSET_URL_PREFIX = "/assets/"
+FINGERPRINT_LENGTH = 12  # Hex digits of the content hash put in each asset name
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/manifest+json",
+                      "application/xml", "image/svg+xml", "image/vnd.microsoft.icon", "image/x-icon")
+MIN_COMPRESSION_SAVING = 0.1  # A variant is only kept if it is at least this much smaller
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+
+class Asset:
+    __slots__ = ("name", "path", "mimetype", "digest", "variants")
+
+    def __init__(self, name, path, mimetype, digest):
+        self.name = name
+        self.path = path
+        self.mimetype = mimetype
+        self.digest = digest
+        self.variants = {}  # Content-Encoding -> precompressed bytes
+
+    def etag(self, encoding=None):
+        # Strong ETags have to differ per encoding, since the bytes do
+        return self.digest if encoding is None else f"{self.digest}-{encoding}"
+
+
+class AssetManifest:
+    """Content-hashed copies of the static files, built once at startup.
+
+    Every file gets a fingerprinted URL ("js/main.js" -> "/assets/js/main.<hash>.js") that can be
+    cached forever, since new content means a new URL. Text-like files also get gzip and brotli
+    variants compressed once here, so serving them never compresses anything.
+    """
+
+    def __init__(self, static_dir):
+        self.static_dir = os.path.abspath(static_dir)
+        self.urls = {}  # Original name -> fingerprinted URL
+        self.assets = {}  # Fingerprinted name -> Asset
+        for root, _, files in os.walk(self.static_dir):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                self.add(os.path.relpath(path, self.static_dir).replace(os.sep, "/"), path)
+
+    def add(self, name, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+        base, ext = os.path.splitext(name)
+        hashed = f"{base}.{digest}{ext}"
+        asset = Asset(name, path, mimetypes.guess_type(name)[0] or "application/octet-stream", digest)
+        if asset.mimetype.startswith(COMPRESSIBLE_TYPES):
+            asset.variants = compress_variants(data)
+        self.assets[hashed] = asset
+        self.urls[name] = ASSET_URL_PREFIX + hashed
+
+    def url(self, name):
+        # Unknown names fall back to the plain static URL
+        return self.urls.get(name, "/static/" + name)
+
+    def get(self, hashed):
+        return self.assets.get(hashed)
+
+
+def compress_variants(data):
+    """gzip and (if available) brotli encodings of data that are worth sending instead of it."""
+    variants = {}
+    for encoding, compress in (("gzip", lambda d: gzip.compress(d, 9, mtime=0)),
+                               ("br", brotli.compress if brotli else None)):
+        if compress is None:
+            continue
+        compressed = compress(data)
+        if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+            variants[encoding] = compressed
+    return variants
+
+
+def pick_encoding(variants, accept_encodings):
+    # Brotli first: it is the smaller of the two for text
+    return next((e for e in ("br", "gzip") if e in variants and accept_encodings[e] > 0), None)
@@ -0,0 +1,89 @@
+import socketio
+from flask import current_app, request
+
+
+class AsyncSocketIO:
+    """The part of Flask-SocketIO's API the game uses, on python-socketio's AsyncServer.
+
+    Handlers stay plain functions. Each event runs inside a Flask test request context with
+    request.sid, namespace and event set, as under Flask-SocketIO (and as forwarded events
+    already run). Handlers run on the event loop; their emits, and room changes for clients
+    connected to another worker, are queued and sent in order by one task.
+    """
+
+    def __init__(self, app, runtime, message_queue=None, **kwargs):
+        self.app = app
+        self.runtime = runtime
+        client_manager = socketio.AsyncRedisManager(message_queue) if message_queue else None
+        self.server = socketio.AsyncServer(async_mode="asgi", client_manager=client_manager, **kwargs)
+        self.outgoing = runtime.queue()
+        runtime.start(self._send)
+        app.extensions["socketio"] = self
+
+    def on(self, event):
+        def decorator(handler):
+            if event == "connect":
+                def trigger(sid, environ, auth=None):
+                    return self._call(handler, sid, event, (auth,))
+            elif event == "disconnect":
+                def trigger(sid, reason=None):
+                    return self._call(handler, sid, event, (reason,))
+            else:
+                def trigger(sid, *args):
+                    return self._call(handler, sid, event, args)
+            self.server.on(event, trigger)
+            return handler
+        return decorator
+
+    def _call(self, handler, sid, event, args):
+        with self.app.test_request_context():
+            request.sid = sid
+            request.namespace = "/"
+            request.event = {"message": event, "args": list(args)}
+            return handler(*args)
+
+    def emit(self, event, data=None, to=None, room=None, skip_sid=None, namespace="/", **kwargs):
+        # Called from the event loop only: handlers, timers and background tasks all run there
+        self.outgoing.put_nowait((self.server.emit, (event, data),
+                                  {"to": to or room, "skip_sid": skip_sid, "namespace": namespace}))
+
+    async def _send(self):
+        while True:
+            call, args, kwargs = await self.outgoing.get()
+            try:
+                await call(*args, **kwargs)
+            except Exception as e:
+                print(f"{call.__name__} {args[0]} failed: {e}")
+
+    def enter_room(self, sid, room, namespace="/"):
+        if self.server.manager.is_connected(sid, namespace):
+            # Connected here: membership is local, so it can change synchronously
+            self.server.manager.basic_enter_room(sid, namespace, room)
+        else:
+            # A join routed here from the worker the client is connected to: the message
+            # queue's manager publishes it there, in order with this worker's emits
+            self.outgoing.put_nowait((self.server.enter_room, (sid, room), {"namespace": namespace}))
+
+    def leave_room(self, sid, room, namespace="/"):
+        if self.server.manager.is_connected(sid, namespace):
+            self.server.manager.basic_leave_room(sid, namespace, room)
+        else:
+            self.outgoing.put_nowait((self.server.leave_room, (sid, room), {"namespace": namespace}))
+
+    def asgi_app(self, on_shutdown=None):
+        from asgiref.wsgi import WsgiToAsgi
+        return socketio.ASGIApp(self.server, WsgiToAsgi(self.app),
+                                on_startup=self.runtime.startup, on_shutdown=on_shutdown)
+
+
+# Drop-in replacements for flask_socketio's request-scoped helpers
+def emit(event, data=None, room=None, to=None, **kwargs):
+    current_app.extensions["socketio"].emit(event, data, to=to or room or request.sid, **kwargs)
+
+
+def join_room(room, sid=None, namespace=None):
+    current_app.extensions["socketio"].enter_room(sid or request.sid, room, namespace or request.namespace)
+
+
+def leave_room(room, sid=None, namespace=None):
+    current_app.extensions["socketio"].leave_room(sid or request.sid, room, namespace or request.namespace)
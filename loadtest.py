@@ -0,0 +1,438 @@
+"""Headless load generator: bot teams play full Kanban Pizza games against a server.
+
+    pip install "python-socketio[client]" psutil
+    python loadtest.py --spawn --rooms 10 --players 5 --round-duration 60 --out report.json
+    python loadtest.py --url http://localhost:10000 --rooms 4 --compare report.json
+    python loadtest.py --spawn --profile 30 --profile-out load.collapsed
+
+--spawn starts a local server on SQLite with shortened rounds and samples its CPU and memory.
+Every bot action is sent with an acknowledgement, so the reported latency is the round trip
+through the handler in main.py. Reports are JSON with stable keys; --compare prints the change
+of the headline numbers against an earlier report. --profile runs the server's sampling profiler
+during the load (with --spawn, or --url plus --admin-token) and saves its collapsed stacks.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+import socketio
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RECIPES = [
+    {"base": 1, "sauce": 1, "ham": 4, "pineapple": 0},
+    {"base": 1, "sauce": 1, "ham": 2, "pineapple": 2},
+]
+ITEM_KEYS = {
+    "prepared_ingredients": "id",
+    "built_pizzas": "pizza_id",
+    "oven": "pizza_id",
+    "completed_pizzas": "pizza_id",
+    "wasted_pizzas": "pizza_id",
+    "customer_orders": "id",
+    "pending_orders": "id",
+}
+OVEN_SECONDS = 35
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.received = {}
+        self.received_bytes = 0
+        self.sent = 0
+        self.timeouts = 0
+        self.scores = []
+
+    def record_call(self, event, seconds):
+        with self.lock:
+            self.sent += 1
+            self.latencies.setdefault(event, []).append(seconds)
+
+    def record_message(self, event, data):
+        size = len(json.dumps(data, separators=(",", ":")))
+        with self.lock:
+            self.received[event] = self.received.get(event, 0) + 1
+            self.received_bytes += size
+
+
+class Bot:
+    def __init__(self, url, room, password, stats, index, rounds, think):
+        self.url = url
+        self.room = room
+        self.password = password
+        self.stats = stats
+        self.index = index
+        self.leader = index == 0
+        self.rounds = rounds
+        self.think = think
+        self.state = None
+        self.lock = threading.Lock()
+        self.phase_changed = threading.Event()
+        self.oven_on_at = None
+        self.recipe = random.choice(RECIPES)
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("*", self.on_message)
+
+    # --- state mirror (same protocol as static/js/main.js) ---
+
+    def on_message(self, event, data=None):
+        self.stats.record_message(event, data)
+        self.dispatch(event, data)
+
+    def dispatch(self, event, data):
+        if event == "batch":
+            for frame_event, frame_data in data:
+                self.dispatch(frame_event, frame_data)
+        elif event in ("game_state", "game_reset"):
+            with self.lock:
+                self.state = data
+            self.phase_changed.set()
+        elif event == "state_patch":
+            self.apply_patch(data)
+        elif event == "round_ended":
+            with self.lock:
+                self.stats.scores.append(data["score"])
+
+    def apply_patch(self, patch):
+        with self.lock:
+            if self.state is None or patch["base"] != self.state.get("version"):
+                self.sio.emit("request_full_state")
+                return
+            state = self.state
+            old_phase = state["current_phase"]
+            state.update(patch.get("set", {}))
+            for name, ids in patch.get("removed", {}).items():
+                gone = set(ids)
+                state[name] = [item for item in state[name] if item[ITEM_KEYS[name]] not in gone]
+            for name, items in patch.get("added", {}).items():
+                state[name] = state[name] + items
+            for sid, player in patch.get("players", {}).items():
+                if player is None:
+                    state["players"].pop(sid, None)
+                else:
+                    state["players"][sid] = player
+            if "lead_times" in patch:
+                state["lead_times"] = patch["lead_times"]
+            state["version"] = patch["version"]
+        if state["current_phase"] != old_phase:
+            self.phase_changed.set()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.state)) if self.state else None
+
+    # --- actions ---
+
+    def call(self, event, data=None):
+        started = time.perf_counter()
+        try:
+            self.sio.call(event, data or {}, timeout=10)
+        except socketio.exceptions.TimeoutError:
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            return
+        self.stats.record_call(event, time.perf_counter() - started)
+
+    def wait_for_phase(self, phase, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            state = self.snapshot()
+            if state and state["current_phase"] == phase:
+                return state
+            self.phase_changed.wait(0.5)
+            self.phase_changed.clear()
+        return None
+
+    def wanted(self, state):
+        if state["round"] < 3:
+            return self.recipe
+        if not state["customer_orders"]:
+            return None
+        # Spread the team over the open orders instead of all chasing the first one
+        return state["customer_orders"][self.index % len(state["customer_orders"])]["ingredients"]
+
+    def play_step(self, state):
+        my_sid = self.sio.get_sid()
+        if self.leader and self.tend_oven(state):
+            return
+        recipe = self.wanted(state)
+        if recipe is None:
+            return
+        player = state["players"].get(my_sid)
+        if player is None:
+            return
+        have = {"base": 0, "sauce": 0, "ham": 0, "pineapple": 0}
+        for ing in player["builder_ingredients"]:
+            have[ing["type"]] += 1
+        missing = [t for t in have if have[t] < recipe[t]]
+        if not missing or any(have[t] > recipe[t] for t in have):
+            self.call("build_pizza", {"player_sid": my_sid})
+            self.recipe = random.choice(RECIPES)
+            return
+        ingredient_type = random.choice(missing)
+        available = [ing for ing in state["prepared_ingredients"] if ing["type"] == ingredient_type]
+        if available:
+            target = {"ingredient_id": random.choice(available)["id"]}
+            if state["round"] > 1:
+                target["target_sid"] = my_sid
+            self.call("take_ingredient", target)
+        else:
+            self.call("prepare_ingredient", {"ingredient_type": ingredient_type})
+
+    def tend_oven(self, state):
+        if state["oven_on"]:
+            if self.oven_on_at and time.time() - self.oven_on_at >= OVEN_SECONDS:
+                self.call("toggle_oven", {"state": "off"})
+                self.oven_on_at = None
+                return True
+            return False
+        if state["built_pizzas"] and len(state["oven"]) < state["max_pizzas_in_oven"]:
+            self.call("move_to_oven", {"pizza_id": state["built_pizzas"][0]["pizza_id"]})
+            return True
+        if state["oven"]:
+            self.call("toggle_oven", {"state": "on"})
+            self.oven_on_at = time.time()
+            return True
+        return False
+
+    def run(self):
+        self.sio.connect(self.url, transports=["websocket"])
+        self.sio.emit("join", {"room": self.room, "password": self.password})
+        if not self.wait_for_phase("waiting", 30):
+            raise RuntimeError(f"{self.room}: never received the room state")
+        for _ in range(self.rounds):
+            state = self.wait_for_phase("waiting", 600)
+            if state is None:
+                break
+            if self.leader:
+                time.sleep(1)  # let the rest of the team join before starting
+                self.call("start_round")
+            state = self.wait_for_phase("round", 60)
+            if state is None:
+                break
+            while state and state["current_phase"] == "round":
+                self.play_step(state)
+                time.sleep(random.uniform(*self.think))
+                state = self.snapshot()
+            self.wait_for_phase("debrief", 60)
+        self.sio.disconnect()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(args):
+    port = free_port()
+    # A room log of its own: a leftover one would have its rooms recovered into this run
+    log_dir = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(os.environ)
+    env.pop("dbpass", None)  # always SQLite
+    env.update({
+        "ROUND_DURATION": str(args.round_duration),
+        "DEBRIEF_DURATION": str(args.debrief_duration),
+        "MAX_ROOMS": str(max(args.rooms, 10)),
+        "ASYNC_MODE": args.async_mode,
+        "ROOM_LOG": os.path.join(log_dir, "room_log.db"),
+    })
+    if args.admin_token:
+        env["ADMIN_TOKEN"] = args.admin_token
+    if args.async_mode == "asyncio":
+        code = ("import asgi, uvicorn; asgi.Server(uvicorn.Config(asgi.application, host='127.0.0.1', "
+                f"port={port}, log_level='warning')).run()")
+    else:
+        code = f"from main import app, socketio; socketio.run(app, host='127.0.0.1', port={port})"
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}", log_dir
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    shutil.rmtree(log_dir, ignore_errors=True)
+    raise RuntimeError("Server did not start listening within 30 seconds")
+
+
+def profile_server(url, token, seconds, out):
+    # Starts the server-side sampler, waits it out and downloads the collapsed stacks
+    headers = {"X-Admin-Token": token}
+    start = urllib.request.Request(f"{url}/admin/profile?seconds={seconds}", method="POST", headers=headers)
+    urllib.request.urlopen(start).close()
+    time.sleep(seconds)
+    while True:
+        with urllib.request.urlopen(urllib.request.Request(f"{url}/admin/profile", headers=headers)) as response:
+            if response.status == 200:
+                with open(out, "wb") as f:
+                    f.write(response.read())
+                print(f"Profile written to {out}")
+                return
+        time.sleep(0.5)
+
+
+def sample_server(pid, samples, stop):
+    if psutil is None:
+        return
+    process = psutil.Process(pid)
+    process.cpu_percent()
+    while not stop.wait(1):
+        try:
+            samples.append((process.cpu_percent(), process.memory_info().rss))
+        except psutil.Error:
+            return
+
+
+def build_report(args, stats, elapsed, samples):
+    latency = {
+        event: {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p90_ms": percentile(values, 90) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": max(values) * 1000,
+        }
+        for event, values in sorted(stats.latencies.items())
+    }
+    all_calls = [v for values in stats.latencies.values() for v in values]
+    received = sum(stats.received.values())
+    report = {
+        "config": {"rooms": args.rooms, "players": args.players, "rounds": args.rounds,
+                   "round_duration": args.round_duration, "think": args.think},
+        "elapsed_s": elapsed,
+        "latency": latency,
+        "latency_all": {"p50_ms": (percentile(all_calls, 50) or 0) * 1000,
+                        "p90_ms": (percentile(all_calls, 90) or 0) * 1000,
+                        "p99_ms": (percentile(all_calls, 99) or 0) * 1000},
+        "sent": {"messages": stats.sent, "per_s": stats.sent / elapsed, "timeouts": stats.timeouts},
+        "received": {"messages": received, "per_s": received / elapsed,
+                     "bytes": stats.received_bytes, "bytes_per_s": stats.received_bytes / elapsed,
+                     "by_event": dict(sorted(stats.received.items()))},
+        "scores": stats.scores,
+    }
+    if samples:
+        report["server"] = {
+            "cpu_percent_avg": sum(cpu for cpu, _ in samples) / len(samples),
+            "cpu_percent_max": max(cpu for cpu, _ in samples),
+            "rss_mb_max": max(rss for _, rss in samples) / 1e6,
+        }
+    return report
+
+
+HEADLINE = [
+    ("latency_all", "p50_ms"), ("latency_all", "p90_ms"), ("latency_all", "p99_ms"),
+    ("received", "per_s"), ("received", "bytes_per_s"),
+    ("server", "cpu_percent_avg"), ("server", "rss_mb_max"),
+]
+
+
+def print_report(report, baseline=None):
+    print(f"{report['config']['rooms']} rooms x {report['config']['players']} bots, "
+          f"{report['elapsed_s']:.0f}s, {report['sent']['messages']} actions, {report['sent']['timeouts']} timeouts")
+    print(f"{'event':<20}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for event, row in report["latency"].items():
+        print(f"{event:<20}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    for section, key in HEADLINE:
+        value = report.get(section, {}).get(key)
+        if value is None:
+            continue
+        line = f"{section}.{key:<16}{value:>14.1f}"
+        old = (baseline or {}).get(section, {}).get(key)
+        if old:
+            line += f"   ({(value - old) / old * 100:+.1f}% vs baseline)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:10000")
+    parser.add_argument("--spawn", action="store_true", help="start a local SQLite server and sample its CPU/memory")
+    parser.add_argument("--async-mode", choices=("eventlet", "asyncio"), default="eventlet",
+                        help="server mode to spawn")
+    parser.add_argument("--rooms", type=int, default=4)
+    parser.add_argument("--players", type=int, default=5, help="bots per room (the server allows at most 5)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--round-duration", type=int, default=60, help="seconds per round when spawning (min 60)")
+    parser.add_argument("--debrief-duration", type=int, default=5, help="seconds of debrief when spawning")
+    parser.add_argument("--think", type=float, nargs=2, default=(0.2, 0.6), help="min/max seconds between actions")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--profile", type=int, metavar="SECONDS", help="profile the server for this long under load")
+    parser.add_argument("--profile-out", default="profile.collapsed", help="where to save the collapsed stacks")
+    parser.add_argument("--admin-token", help="the server's ADMIN_TOKEN (generated when spawning)")
+    args = parser.parse_args()
+    args.round_duration = max(args.round_duration, 60)
+    if args.profile and args.spawn and not args.admin_token:
+        args.admin_token = uuid.uuid4().hex
+
+    server, url, log_dir, samples, stop = None, args.url, None, [], threading.Event()
+    if args.spawn:
+        server, url, log_dir = spawn_server(args)
+        threading.Thread(target=sample_server, args=(server.pid, samples, stop), daemon=True).start()
+
+    stats = Stats()
+    bots = [Bot(url, f"load-{r}", "load", stats, index=p, rounds=args.rounds, think=tuple(args.think))
+            for r in range(args.rooms) for p in range(args.players)]
+    threads = [threading.Thread(target=bot.run, daemon=True) for bot in bots]
+    profiler = None
+    if args.profile:
+        profiler = threading.Thread(target=profile_server,
+                                    args=(url, args.admin_token, args.profile, args.profile_out), daemon=True)
+    started = time.time()
+    try:
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)  # stagger connects a little, like people arriving
+        if profiler:
+            profiler.start()
+        for thread in threads:
+            thread.join()
+        if profiler:
+            profiler.join()
+    finally:
+        elapsed = time.time() - started
+        stop.set()
+        if server:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(log_dir, ignore_errors=True)
+
+    report = build_report(args, stats, elapsed, samples)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,80 @@
-import eventlet
 from flask import Flask, render_template, request, send_file
-from flask_socketio import SocketIO, emit, join_room
+import functools
+import hashlib
+import heapq
+import hmac
+import re
 import time
 import uuid
 import random
 from flask_compress import Compress
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import OperationalError
 import os
+import signal
+import sqlite3
+
+from analytics import RoundTimeline, analyze, timeline_from_log
+from assets import AssetManifest, compress_variants, pick_encoding
+from metrics import counting_packet, instrument, probe_hub_lag, render as render_metrics
+from profiler import SamplingProfiler
+from room_log import RoomLog
+from room_store import room_store_from_url
+from runtime import runtime_for
+from state import (LOOK_INVALID, LOOK_UNMATCHED, PIZZA_LOOKS, Ingredient, LeadTimes, Order, Pizza, Player,
+                   Snapshot, WireJSON, game_state_from_log, new_game_state, to_columns, to_log, to_wire)
+from timers import TimerWheel
+
+# "eventlet" (wsgi.py) or "asyncio" (asgi.py, python-socketio's AsyncServer under an ASGI server)
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "eventlet")
+rt = runtime_for(ASYNC_MODE)
+if ASYNC_MODE == "asyncio":
+    from async_socketio import AsyncSocketIO, emit, join_room, leave_room
+else:
+    from flask_socketio import SocketIO, emit, join_room, leave_room
 
 app = Flask(__name__)
 Compress(app)
 
 app.config['SECRET_KEY'] = 'secret!'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', ping_timeout=60, ping_interval=25)
 
 group_games = {}
 player_group = {}
+# Last event time per sid; kept out of the room state so it never dirties a snapshot
+player_activity = {}
 
 ROOM_TIMEOUT = 1800  # Room inactive timeout (seconds)
 PLAYER_TIMEOUT = 300  # Player inactivity timeout (seconds)
-MAX_ROOMS = 10
+MAX_ROOMS = int(os.environ.get("MAX_ROOMS", 10))  # Across all workers sharing the room store
 MAX_PLAYERS = 5  # Maximum players per room
+ROUND_DURATION = int(os.environ.get("ROUND_DURATION", 180))  # Seconds per round (shortened for load tests)
+DEBRIEF_DURATION = int(os.environ.get("DEBRIEF_DURATION", 120))  # Seconds of debrief between rounds
+BROADCAST_WINDOW = 0.04  # Seconds room broadcasts are coalesced before sending
+SCORE_WRITE_RETRIES = 3  # Retries for a failed round-result write before it is dropped
+LEADERBOARD_PAGE_SIZE = 20  # Default results per /leaderboard page
+MAX_LEADERBOARD_PAGE_SIZE = 100
+HIGH_SCORE_TTL = int(os.environ.get("HIGH_SCORE_TTL", 0))  # Seconds before re-reading high scores (0 = never)
+CLOCK_TICK_INTERVAL = 1  # Seconds between server-pushed time_response ticks
+ROOM_LEASE_TTL = 15  # Seconds a worker's rooms survive without a heartbeat
+LOBBY_ROOM = "lobby"  # Socket.IO room of clients on the join screen
+WIRE_COLUMNS = "columns"  # Compact encoding a client can ask for in its connect auth
+OVEN_BURN_WARNING = 40  # Oven seconds at which players are warned their pizzas are about to burn
+LOG_WRITE_INTERVAL = 0.5  # Seconds between batched writes of the room log
+ASSET_MAX_AGE = 31536000  # Seconds browsers may cache fingerprinted assets (a year)
+
+# Multi-worker mode: rooms are listed in a shared store and emits fan out through the message queue
+ROOM_STORE_URL = os.environ.get("ROOM_STORE_URL")
+MESSAGE_QUEUE = os.environ.get("MESSAGE_QUEUE", ROOM_STORE_URL)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+room_store = room_store_from_url(ROOM_STORE_URL)
+
+# Append-only log of room changes, so a restarted process can bring its rooms back ("" disables it)
+ROOM_LOG = os.environ.get("ROOM_LOG", "room_log.db")
+room_log = RoomLog(ROOM_LOG, rt.threading.Lock()) if ROOM_LOG else None
+
+# Admin routes (e.g. the sampling profiler) are only served when a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+profiler = SamplingProfiler(os.environ.get("PROFILE_DIR", "profiles"), rt.threading, rt.thread_sleep)
 
 shutdown_flag = False
 
@@ -39,7 +93,13 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True
 }
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', ping_timeout=60, ping_interval=25)
+if ASYNC_MODE == "asyncio":
+    socketio = AsyncSocketIO(app, rt, message_queue=MESSAGE_QUEUE, cors_allowed_origins="*", ping_timeout=60,
+                             ping_interval=25, json=WireJSON)
+else:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', ping_timeout=60, ping_interval=25,
+                        message_queue=MESSAGE_QUEUE, json=WireJSON)
+socketio.server.packet_class = counting_packet(socketio.server.packet_class)
 db = SQLAlchemy(app)
 
 # PostgreSQL/SQLite model
@@ -56,8 +116,54 @@ class HighScore(db.Model):
         db.UniqueConstraint('round_number', 'ranking', name='_round_ranking_uc'),
     )
 
+
+# Every finished round; leaderboards are read off its indexes rather than kept as a rewritten top 3
+class RoundResult(db.Model):
+    __tablename__ = 'round_results'
+    id = db.Column(db.Integer, primary_key=True)
+    room_name = db.Column(db.String, nullable=False)
+    round_number = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    wasted = db.Column(db.Integer, nullable=False, default=0)
+    unsold = db.Column(db.Integer, nullable=False, default=0)
+    ingredients_left = db.Column(db.Integer, nullable=False, default=0)
+    fulfilled_orders = db.Column(db.Integer)  # Round 3 only
+    timestamp = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    __table_args__ = (
+        # id ends each index so the tiebreaks in the leaderboard ORDER BYs are read off it too
+        db.Index('ix_round_results_round_score_id', 'round_number', score.desc(), 'id'),
+        db.Index('ix_round_results_room_time_id', 'room_name', 'timestamp', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            "room_name": self.room_name,
+            "round": self.round_number,
+            "score": self.score,
+            "completed": self.completed,
+            "wasted": self.wasted,
+            "unsold": self.unsold,
+            "ingredients_left": self.ingredients_left,
+            "fulfilled_orders": self.fulfilled_orders,
+            "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S") if self.timestamp else "N/A"
+        }
+
+
 with app.app_context():
     db.create_all()
+    # One-off carry-over of the old top-3 table so existing leaderboards survive the switch
+    if RoundResult.query.first() is None and HighScore.query.first() is not None:
+        db.session.add_all(RoundResult(room_name=hs.room_name, round_number=hs.round_number, score=hs.score,
+                                       timestamp=hs.timestamp) for hs in HighScore.query.all())
+        db.session.commit()
+    # create_all leaves an existing table's indexes alone: swap in the ones that end in id
+    for index in RoundResult.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    for old_index in ('ix_round_results_round_score', 'ix_round_results_room_time'):
+        db.session.execute(db.text(f"DROP INDEX IF EXISTS {old_index}"))
+    db.session.commit()
 
 @app.route('/download-db')
 def download_db():
@@ -66,121 +172,648 @@ def download_db():
     return "Database download not supported in PostgreSQL environment.", 403
 
 
+@app.route('/metrics')
+def metrics():
+    # The stats belong to the event loop; under asyncio this route runs in a server thread
+    return rt.on_loop(render_metrics_page)
+
+
+def render_metrics_page():
+    gauges = {
+        "rooms": ("Rooms owned by this worker.", len(group_games)),
+        "players": ("Players in rooms owned by this worker.", len(player_group)),
+        "timers": ("Deadlines scheduled on the timer wheel.", len(timer_wheel.pending())),
+        "compact_clients": ("Clients using the columnar encoding.", len(compact_clients)),
+    }
+    for name, value in score_writer_stats.items():
+        gauges[f"score_writer_{name}"] = (f"Round-result writer {name.replace('_', ' ')}.", value)
+    return render_metrics(gauges), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+def admin_authorized():
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    # POST ?seconds=N starts sampling; GET returns the latest collapsed-stack file
+    if not admin_authorized():
+        return "Not found", 404
+    if request.method == 'POST':
+        path = profiler.start(request.args.get("seconds", 30, type=int))
+        if path is None:
+            return {"error": "A profile is already running."}, 409
+        return {"file": os.path.basename(path)}, 202
+    if profiler.running:
+        return {"status": "running"}, 202
+    if not profiler.last_path:
+        return "No profile recorded yet.", 404
+    return send_file(profiler.last_path, mimetype="text/plain")
+
+
 def sanitize_game_state_for_emit(game_state):
-    clean_copy = dict(game_state)
-    clean_copy.pop("round_timer_thread", None)
-    clean_copy.pop("debrief_timer_thread", None)
-    return clean_copy
+    return {k: to_wire(v) for k, v in game_state.items()}
+
+
+# Collections synced as added/removed ids, keyed by each item's id field
+SYNCED_COLLECTIONS = {
+    "prepared_ingredients": "id",
+    "built_pizzas": "pizza_id",
+    "oven": "pizza_id",
+    "completed_pizzas": "pizza_id",
+    "wasted_pizzas": "pizza_id",
+    "customer_orders": "id",
+    "pending_orders": "id",
+}
+NON_SCALAR_KEYS = set(SYNCED_COLLECTIONS) | {"players", "lead_times"}
+
+# Per-room version and a shadow of what clients last received
+room_sync = {}
+# Per-room broadcasts waiting to be coalesced into one frame
+room_outbox = {}
+# Sids connected here that negotiated the columnar encoding
+compact_clients = set()
+# Every deadline (round/debrief end, order arrivals, oven warnings, inactivity) runs off one wheel
+timer_wheel = TimerWheel(sleep=rt.sleep)
+# Per-room named timer handles, so a deadline can be replaced or cancelled
+room_timers = {}
+# Per-room heaps of round-3 orders still to arrive
+order_arrivals = {}
+# Station counts of each room's round in progress, sampled at every flushed patch
+round_timelines = {}
+# Per-room debrief analytics by round number, computed once when the round ends
+round_analytics = {}
 
-def new_game_state(password=None):
+
+def schedule_room_timer(room, name, delay, callback, *args):
+    cancel_room_timer(room, name)
+    room_timers.setdefault(room, {})[name] = timer_wheel.schedule(delay, callback, *args, name=name, room=room)
+
+
+def cancel_room_timer(room, *names):
+    timers = room_timers.get(room, {})
+    for name in names:
+        timer = timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+
+
+def cancel_round_timers(room):
+    cancel_room_timer(room, "round_end", "debrief_end", "order_arrival", "oven_warning")
+    order_arrivals.pop(room, None)
+
+
+def cancel_room_timers(room):
+    for timer in room_timers.pop(room, {}).values():
+        timer.cancel()
+    order_arrivals.pop(room, None)
+
+
+def state_shadow(game_state):
     return {
-        "players": {},
-        "prepared_ingredients": [],
-        "built_pizzas": [],
-        "oven": [],
-        "completed_pizzas": [],
-        "wasted_pizzas": [],
-        "round": 1,
-        "max_rounds": 3,
-        "current_phase": "waiting",
-        "max_pizzas_in_oven": 3,
-        "round_duration": 180,
-        "oven_on": False,
-        "oven_timer_start": None,
-        "round_start_time": None,
-        "debrief_duration": 120,
-        "customer_orders": [],
-        "pending_orders": [],
-        "last_updated": time.time(),
-        "lead_times": [],
-        "password": password,
-        "round_timer_thread": None,  
-        "debrief_timer_thread": None  
+        "scalars": {k: v for k, v in game_state.items() if k not in NON_SCALAR_KEYS},
+        "collections": {name: [item[key] for item in game_state[name]] for name, key in SYNCED_COLLECTIONS.items()},
+        "players": {sid: [ing["id"] for ing in player["builder_ingredients"]]
+                    for sid, player in game_state["players"].items()},
+        "lead_times": (id(game_state["lead_times"]), game_state["lead_times"].count)
     }
 
 
-def save_high_score(room, round_number, score):
+def room_sync_state(room, game_state):
+    sync = room_sync.get(room)
+    if sync is None:
+        sync = room_sync[room] = {"version": 0, "shadow": state_shadow(game_state), "snapshot": None}
+    return sync
+
+
+def full_state_payload(room, game_state):
+    # Serialized once per version; joins, resyncs and resets at the same version reuse it
+    sync = room_sync_state(room, game_state)
+    snapshot = sync["snapshot"]
+    if snapshot is not None and snapshot.version == sync["version"]:
+        outbox = room_outbox.get(room)
+        if outbox is None or outbox["patch_at"] is None:
+            return snapshot
+    payload = sanitize_game_state_for_emit(game_state)
+    payload["version"] = sync["version"]
+    snapshot = sync["snapshot"] = Snapshot(sync["version"], payload)
+    return snapshot
+
+
+def build_state_patch(room, game_state):
+    sync = room_sync.get(room)
+    if sync is None:
+        room_sync_state(room, game_state)
+        return None
+    old, new = sync["shadow"], state_shadow(game_state)
+    patch = {}
+
+    changed = {k: v for k, v in new["scalars"].items() if old["scalars"].get(k, object()) != v}
+    if changed:
+        patch["set"] = changed
+
+    added, removed = {}, {}
+    for name, key in SYNCED_COLLECTIONS.items():
+        old_ids, new_ids = set(old["collections"][name]), set(new["collections"][name])
+        gone = [item_id for item_id in old["collections"][name] if item_id not in new_ids]
+        fresh = [item for item in game_state[name] if item[key] not in old_ids]
+        if gone:
+            removed[name] = gone
+        if fresh:
+            added[name] = fresh
+    if added:
+        patch["added"] = added
+    if removed:
+        patch["removed"] = removed
+
+    players = {sid: None for sid in old["players"] if sid not in new["players"]}
+    for sid, ids in new["players"].items():
+        if old["players"].get(sid) != ids:
+            players[sid] = {"builder_ingredients": game_state["players"][sid]["builder_ingredients"]}
+    if players:
+        patch["players"] = players
+
+    if new["lead_times"] != old["lead_times"]:
+        patch["lead_times"] = game_state["lead_times"]
+
+    if not patch:
+        return None
+    patch["base"] = sync["version"]
+    sync["version"] += 1
+    patch["version"] = sync["version"]
+    sync["shadow"] = new
+    return patch
+
+
+def queue_broadcast(room, event, data):
+    outbox = room_outbox.get(room)
+    if outbox is None:
+        outbox = room_outbox[room] = {"frames": [], "patch_at": None}
+        outbox["timer"] = rt.call_later(BROADCAST_WINDOW, flush_broadcasts, room)
+    if event is not None:
+        # Serialized now: records queued here can change before the flush
+        outbox["frames"].append([event, to_wire(data)])
+    return outbox
+
+
+def mark_state_dirty(room):
+    # The patch is built once at flush time, so superseded states are never sent
+    outbox = queue_broadcast(room, None, None)
+    outbox["patch_at"] = len(outbox["frames"])
+
+
+def flush_broadcasts(room):
+    outbox = room_outbox.pop(room, None)
+    if outbox is None:
+        return
+    outbox["timer"].cancel()
+    frames = outbox["frames"]
+    game_state = group_games.get(room)
+    if outbox["patch_at"] is not None and game_state is not None:
+        patch = build_state_patch(room, game_state)
+        if patch:
+            frames.insert(outbox["patch_at"], ["state_patch", patch])
+            timeline = round_timelines.get(room)
+            if timeline is not None and game_state["current_phase"] == "round":
+                timeline.record(time.time(), game_state)
+    if frames:
+        if room_log is not None and game_state is not None:
+            log_frames(room, game_state, frames)
+        emit_frames(room, to_wire(frames))
+
+
+def log_frames(room, game_state, frames):
+    version = room_sync_state(room, game_state)["version"]
+    room_log.append(room, to_log(frames), version)
+    events = {event for event, _ in frames}
+    if "round_started" in events:
+        room_log.snapshot(room, to_log(game_state), version, round_start=True)
+    elif "round_ended" in events or room_log.needs_snapshot(room):
+        room_log.snapshot(room, to_log(game_state), version)
+
+
+async def room_log_writer():
+    while True:
+        await rt.sleep(LOG_WRITE_INTERVAL)
+        operations = room_log.take_pending()
+        if not operations:
+            continue
+        try:
+            await rt.in_thread(room_log.write, operations)
+        except sqlite3.Error as e:
+            print(f"Room log write of {len(operations)} entries failed: {e}")
+
+
+def begin_shutdown():
+    # Stop handlers from tearing rooms down as sockets close, and get the log onto disk
+    global shutdown_flag
+    shutdown_flag = True
+    if room_log is not None:
+        # Waits on write_lock for a batch the writer may have in flight
+        room_log.write(room_log.take_pending())
+
+
+def on_shutdown(signum, frame):
+    begin_shutdown()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+if room_log is not None:
+    rt.start(room_log_writer)
+if ASYNC_MODE == "eventlet":
+    signal.signal(signal.SIGTERM, on_shutdown)  # asgi.py hooks begin_shutdown into the ASGI server's own handler
+
+
+def emit_frames(room, frames):
+    # Columnar clients get one 'packed' event; everyone else the plain JSON frames
+    if room in compact_clients:
+        compact = [room]
+    else:
+        game_state = group_games.get(room)
+        compact = [sid for sid in game_state["players"] if sid in compact_clients] if game_state else []
+    if compact:
+        socketio.emit('packed', to_columns(frames), to=compact)
+    if compact == [room]:
+        return
+    if len(frames) == 1:
+        socketio.emit(frames[0][0], frames[0][1], room=room, skip_sid=compact)
+    else:
+        socketio.emit('batch', frames, room=room, skip_sid=compact)
+
+
+high_score_cache = {"scores": None, "loaded_at": 0, "refreshing": False}
+# Scores waiting for the write-behind worker, plus its health counters
+score_queue = rt.queue()
+score_writer_stats = {"queue_depth": 0, "flushes": 0, "retries": 0, "failures": 0, "last_flush_latency": 0.0}
+
+
+def merge_top_three(scores_list, room, score):
+    scores_list = scores_list + [(room, score)]
+    scores_list.sort(key=lambda x: x[1], reverse=True)
+    return scores_list[:3]
+
+
+def save_round_result(room, round_number, result):
+    # Update the cache now and leave the database write to score_writer
+    score = result["score"]
+    if high_score_cache["scores"] is not None:
+        cached = high_score_cache["scores"][round_number]
+        current = [(cached[rank]["room_name"], cached[rank]["score"]) for rank in sorted(cached)]
+        timestamp_str = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        high_score_cache["scores"][round_number] = {
+            rank: {"room_name": room_name, "score": score_val, "timestamp": timestamp_str}
+            for rank, (room_name, score_val) in enumerate(merge_top_three(current, room, score), 1)
+        }
+    score_queue.put_nowait(RoundResult(
+        room_name=room,
+        round_number=round_number,
+        score=score,
+        completed=result["completed_pizzas_count"],
+        wasted=result["wasted_pizzas_count"],
+        unsold=result["unsold_pizzas_count"],
+        ingredients_left=result["ingredients_left_count"],
+        fulfilled_orders=result.get("fulfilled_orders_count")
+    ))
+    score_writer_stats["queue_depth"] = score_queue.qsize()
+
+
+def persist_round_results(results):
+    # Runs in a tpool OS thread so the blocking DB driver never stalls the hub; plain inserts, no rewrite
     with app.app_context():
-        current_scores = HighScore.query.filter_by(round_number=round_number).order_by(HighScore.ranking).all()
-        scores_list = [(hs.room_name, hs.score, hs.ranking) for hs in current_scores]
-        scores_list.append((room, score, 0))
-        scores_list.sort(key=lambda x: x[1], reverse=True)
-        top_three = scores_list[:3]
-
-        HighScore.query.filter_by(round_number=round_number).delete()
-        for rank, (room_name, score_val, _) in enumerate(top_three, 1):
-            new_score = HighScore(room_name=room_name, round_number=round_number, score=score_val, ranking=rank)
-            db.session.add(new_score)
-        db.session.commit()
+        try:
+            db.session.add_all(results)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
-def get_high_scores():
+
+async def score_writer():
+    while not shutdown_flag:
+        batch = [await rt.get(score_queue)]
+        while not score_queue.empty():
+            batch.append(score_queue.get_nowait())
+        score_writer_stats["queue_depth"] = score_queue.qsize()
+
+        for attempt in range(SCORE_WRITE_RETRIES + 1):
+            started = time.time()
+            try:
+                await rt.in_thread(persist_round_results, batch)
+            except OperationalError as e:
+                if attempt == SCORE_WRITE_RETRIES:
+                    score_writer_stats["failures"] += 1
+                    print(f"Giving up saving {len(batch)} round results: {e}")
+                    break
+                score_writer_stats["retries"] += 1
+                await rt.sleep(2 ** attempt)
+            except Exception as e:
+                score_writer_stats["failures"] += 1
+                print(f"Could not save {len(batch)} round results: {e}")
+                break
+            else:
+                score_writer_stats["flushes"] += 1
+                score_writer_stats["last_flush_latency"] = time.time() - started
+                break
+
+
+rt.start(score_writer)
+
+
+def top_results(round_number, limit):
+    # Walks ix_round_results_round_score; ties go to the earlier result
+    return (RoundResult.query.filter_by(round_number=round_number)
+            .order_by(RoundResult.score.desc(), RoundResult.id).limit(limit).all())
+
+
+def load_high_scores():
     with app.app_context():
-        scores = HighScore.query.order_by(HighScore.round_number, HighScore.ranking).all()
         result = {1: {}, 2: {}, 3: {}}
-        for score in scores:
-            timestamp_str = score.timestamp.strftime("%Y-%m-%d %H:%M:%S") if score.timestamp else "N/A"
-            result[score.round_number][score.ranking] = {
-                "room_name": score.room_name,
-                "score": score.score,
-                "timestamp": timestamp_str
-            }
-        return result
+        for round_number in result:
+            for rank, score in enumerate(top_results(round_number, 3), 1):
+                entry = score.to_dict()
+                result[round_number][rank] = {
+                    "room_name": entry["room_name"],
+                    "score": entry["score"],
+                    "timestamp": entry["timestamp"]
+                }
+    high_score_cache["scores"] = result
+    high_score_cache["loaded_at"] = time.time()
+    return result
 
-def update_player_activity(sid):
-    room = player_group.get(sid)
-    if room and room in group_games:
-        player = group_games[room]["players"].get(sid)
-        if player is not None:
-            player["last_activity"] = time.time()
+
+def get_high_scores():
+    # Served from memory; HIGH_SCORE_TTL > 0 re-reads the table in the background to pick up other instances' writes
+    if (HIGH_SCORE_TTL and not high_score_cache["refreshing"]
+            and time.time() - high_score_cache["loaded_at"] >= HIGH_SCORE_TTL):
+        high_score_cache["refreshing"] = True
+        rt.start(refresh_high_scores)
+    return high_score_cache["scores"]
+
+
+async def refresh_high_scores():
+    try:
+        await rt.in_thread(load_high_scores)
+        schedule_room_list_update()
+    except Exception as e:
+        print(f"Could not reload high scores: {e}")
+    finally:
+        high_score_cache["refreshing"] = False
+
+
+load_high_scores()
+
+
+def leaderboard_page(query, page, per_page):
+    with app.app_context():
+        pagination = query().paginate(page=page, per_page=per_page, max_per_page=MAX_LEADERBOARD_PAGE_SIZE,
+                                      error_out=False)
+        return {
+            "results": [result.to_dict() for result in pagination.items],
+            "page": pagination.page,
+            "per_page": pagination.per_page,
+            "total": pagination.total,
+            "pages": pagination.pages
+        }
+
+
+@app.route('/leaderboard/<int:round_number>')
+def round_leaderboard(round_number):
+    # Every team's result for a round, best first; ?page=&per_page= to page through an event
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", LEADERBOARD_PAGE_SIZE, type=int)
+    return rt.blocking(leaderboard_page, lambda: (
+        RoundResult.query.filter_by(round_number=round_number)
+        .order_by(RoundResult.score.desc(), RoundResult.id)), page, per_page)
+
+
+@app.route('/leaderboard/rooms/<room_name>')
+def room_history(room_name):
+    # One team's results across the session, newest first
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", LEADERBOARD_PAGE_SIZE, type=int)
+    return rt.blocking(leaderboard_page, lambda: (
+        RoundResult.query.filter_by(room_name=room_name)
+        .order_by(RoundResult.timestamp.desc(), RoundResult.id.desc())), page, per_page)
+
+
+# Raw handlers of room events, for running events forwarded by other workers
+routed_handlers = {}
+
+
+def room_owner_elsewhere(event, args):
+    if event == "join":
+        room = args[0].get("room") if args and isinstance(args[0], dict) else None
+    else:
+        room = player_group.get(request.sid)
+    if not room or room in group_games:
+        return None, room
+    owner = room_store.owner(room)
+    return (owner if owner != WORKER_ID else None), room
+
+
+def routed(event):
+    # Runs the handler here if this worker owns the room, otherwise forwards it to the owner
+    def decorator(handler):
+        routed_handlers[event] = handler
+
+        @functools.wraps(handler)
+        def wrapper(*args):
+            owner, room = room_owner_elsewhere(event, args)
+            if owner is None:
+                return handler(*args)
+            message = {"event": event, "sid": request.sid, "args": list(args)}
+            if event == "join":
+                player_group[request.sid] = room
+                # The encoding was negotiated on this worker; the owner does the room's emits
+                if request.sid in compact_clients:
+                    message["encoding"] = WIRE_COLUMNS
+            elif event == "disconnect":
+                player_group.pop(request.sid, None)
+                compact_clients.discard(request.sid)
+            room_store.forward(owner, message)
+        return wrapper
+    return decorator
+
+
+def handle_forwarded_event(message):
+    handler = routed_handlers.get(message["event"])
+    if handler is None:
+        return
+    if message.get("encoding") == WIRE_COLUMNS:
+        compact_clients.add(message["sid"])
+    with app.test_request_context():
+        request.sid = message["sid"]
+        request.namespace = "/"
+        request.event = {"message": message["event"], "args": message["args"]}
+        try:
+            handler(*message["args"])
+        except Exception as e:
+            print(f"Forwarded {message['event']} from {message['sid']} failed: {e}")
 
 
-def check_inactive_rooms():
+async def room_store_heartbeat():
     while not shutdown_flag:
-        current_time = time.time()
-        rooms_to_remove = []
-        for room, game_state in list(group_games.items()):
-            players_to_remove = []
-            for sid, player in list(game_state["players"].items()):
-                if current_time - player.get("last_activity", game_state["last_updated"]) >= PLAYER_TIMEOUT:
-                    print(f"Removing inactive player {sid} from room {room}")
-                    players_to_remove.append(sid)
-            for sid in players_to_remove:
-                if sid in player_group:
-                    socketio.emit('player_timeout',
-                                  {"message": "You have been inactive and are removed from the room."}, room=sid)
-                    del player_group[sid]
-                del game_state["players"][sid]
-            if current_time - game_state["last_updated"] >= ROOM_TIMEOUT or not game_state["players"]:
-                print(f"Removing inactive room {room}")
-                rooms_to_remove.append(room)
-        for room in rooms_to_remove:
-            if room in group_games:
-                for sid in list(group_games[room]["players"]):
-                    if sid in player_group:
-                        socketio.emit('room_expired', {"message": "Room inactive for a long time, please reconnect."},
-                                      room=sid)
-                        del player_group[sid]
-                del group_games[room]
-                update_room_list()
-        eventlet.sleep(60)
-
-
-eventlet.spawn(check_inactive_rooms)
+        await rt.in_thread(room_store.heartbeat, WORKER_ID, ROOM_LEASE_TTL)
+        if room_store.shared and await rt.in_thread(lobby_rooms) != lobby_snapshot["rooms"]:
+            # A worker that stopped heartbeating takes its rooms with it without anyone leaving them
+            schedule_room_list_update()
+        await rt.sleep(ROOM_LEASE_TTL / 3)
+
+
+def remove_room(room):
+    cancel_room_timers(room)
+    del group_games[room]
+    room_sync.pop(room, None)
+    round_timelines.pop(room, None)
+    round_analytics.pop(room, None)
+    room_store.release(room)
+    if room_log is not None:
+        room_log.drop(room)
+
+
+room_store.heartbeat(WORKER_ID, ROOM_LEASE_TTL)
+rt.start(room_store_heartbeat)
+rt.listen(room_store.listen, WORKER_ID, rt.threadsafe(handle_forwarded_event))
+
+
+def update_player_activity(sid):
+    if sid in player_activity:
+        player_activity[sid] = time.time()
+
+
+def track_player_activity(room, sid):
+    schedule_room_timer(room, "player:" + sid, PLAYER_TIMEOUT, expire_player, room, sid)
+
+
+def expire_player(room, sid):
+    # Activity only refreshes player_activity; the deadline is rechecked here and pushed back if it moved
+    game_state = group_games.get(room)
+    player = game_state["players"].get(sid) if game_state else None
+    if shutdown_flag or player is None:
+        return
+    remaining = player_activity.get(sid, game_state["last_updated"]) + PLAYER_TIMEOUT - time.time()
+    if remaining > 0:
+        schedule_room_timer(room, "player:" + sid, remaining, expire_player, room, sid)
+        return
+    print(f"Removing inactive player {sid} from room {room}")
+    player_activity.pop(sid, None)
+    if sid in player_group:
+        socketio.emit('player_timeout', {"message": "You have been inactive and are removed from the room."}, room=sid)
+        del player_group[sid]
+    del game_state["players"][sid]
+    room_timers[room].pop("player:" + sid, None)
+    if game_state["players"]:
+        room_store.update(room, len(game_state["players"]))
+        mark_state_dirty(room)
+    else:
+        print(f"Removing inactive room {room}")
+        remove_room(room)
+    schedule_room_list_update()
+
+
+def expire_room(room):
+    game_state = group_games.get(room)
+    if shutdown_flag or not game_state:
+        return
+    remaining = game_state["last_updated"] + ROOM_TIMEOUT - time.time()
+    if remaining > 0:
+        schedule_room_timer(room, "room_expiry", remaining, expire_room, room)
+        return
+    print(f"Removing inactive room {room}")
+    for sid in list(game_state["players"]):
+        player_activity.pop(sid, None)
+        if sid in player_group:
+            socketio.emit('room_expired', {"message": "Room inactive for a long time, please reconnect."}, room=sid)
+            del player_group[sid]
+    remove_room(room)
+    schedule_room_list_update()
+
+
+room_list_update = None
+
+
+def schedule_room_list_update():
+    # Changes falling due on the same tick share one lobby update
+    global room_list_update
+    if room_list_update is None or not room_list_update.active:
+        room_list_update = timer_wheel.schedule(0, update_room_list)
 
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return cached_page("index", lambda: render_template('index.html'), 'index.html')
+
+
+# Rendered pages and their compressed variants; a page load is a lookup here rather than a render
+page_cache = {}
+
+
+def template_mtime(template):
+    # Only looked at when Flask reloads templates (debug); otherwise a rendered page is final
+    if template is None or not app.jinja_env.auto_reload:
+        return None
+    return os.stat(os.path.join(app.root_path, app.template_folder, template)).st_mtime_ns
+
+
+def cached_page(name, render, template=None):
+    """Serves a mostly-static page from memory with a strong ETag, so revisits get a 304."""
+    mtime = template_mtime(template)
+    page = page_cache.get(name)
+    if page is None or page["mtime"] != mtime:
+        body = render().encode()
+        page = page_cache[name] = {"mtime": mtime, "body": body, "etag": hashlib.sha256(body).hexdigest()[:16],
+                                   "variants": compress_variants(body)}
+    encoding = pick_encoding(page["variants"], request.accept_encodings)
+    if encoding is None:
+        response = app.response_class(page["body"], mimetype="text/html")
+        response.set_etag(page["etag"])
+    else:
+        response = app.response_class(page["variants"][encoding], mimetype="text/html")
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(f"{page['etag']}-{encoding}")
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "no-cache"  # Always revalidate; the ETag makes that a 304
+    return response.make_conditional(request)
+
+
+# Static files are fingerprinted and precompressed once at startup; templates link them via asset()
+assets = AssetManifest(os.path.join(app.root_path, "static"))
+app.jinja_env.globals["asset"] = assets.url
+
+
+@app.route('/assets/<path:name>')
+def asset_file(name):
+    asset = assets.get(name)
+    if asset is None:
+        return "Not found", 404
+    encoding = pick_encoding(asset.variants, request.accept_encodings)
+    if encoding is None:
+        response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag(), conditional=True)
+    else:
+        response = app.response_class(asset.variants[encoding], mimetype=asset.mimetype)
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(asset.etag(encoding))
+        response.make_conditional(request)
+    if asset.variants:
+        response.vary.add("Accept-Encoding")
+    # The URL changes whenever the content does, so nothing ever needs revalidating
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
 
 
 @socketio.on('connect')
+@instrument('connect')
 def on_connect(data):
     print(f"Client connected: {request.sid}")
+    if data and data.get("encoding") == WIRE_COLUMNS:
+        compact_clients.add(request.sid)
     update_player_activity(request.sid)
-    update_room_list()
 
 
 @socketio.on('join')
+@instrument('join')
+@routed('join')
 def on_join(data):
     if shutdown_flag:
         return
@@ -192,8 +825,12 @@ def on_join(data):
         emit('join_error', {"message": "Room name and password are required."}, room=request.sid)
         return
 
-    if room not in group_games and len(group_games) >= MAX_ROOMS:
-        emit('join_error', {"message": "Maximum room limit (10) reached."}, room=request.sid)
+    if room == LOBBY_ROOM:
+        emit('join_error', {"message": "That room name is reserved."}, room=request.sid)
+        return
+
+    if room not in group_games and room_store.room_count() >= MAX_ROOMS:
+        emit('join_error', {"message": f"Maximum room limit ({MAX_ROOMS}) reached."}, room=request.sid)
         return
 
     if room in group_games:
@@ -201,7 +838,11 @@ def on_join(data):
             emit('join_error', {"message": "Incorrect password."}, room=request.sid)
             return
     else:
-        group_games[room] = new_game_state(password)
+        if not room_store.claim(room, WORKER_ID):
+            emit('join_error', {"message": "Room is being created elsewhere, please try again."}, room=request.sid)
+            return
+        group_games[room] = new_game_state(password, ROUND_DURATION, DEBRIEF_DURATION)
+        schedule_room_timer(room, "room_expiry", ROOM_TIMEOUT, expire_room, room)
 
     game_state = group_games[room]
     if len(game_state["players"]) >= MAX_PLAYERS:
@@ -209,66 +850,54 @@ def on_join(data):
         return
 
     player_group[request.sid] = room
+    player_activity[request.sid] = time.time()
     if request.sid not in game_state["players"]:
-        game_state["players"][request.sid] = {"builder_ingredients": [], "last_activity": time.time()}
-    else:
-        game_state["players"][request.sid]["last_activity"] = time.time()
+        game_state["players"][request.sid] = Player(builder_ingredients=[])
+        track_player_activity(room, request.sid)
+        mark_state_dirty(room)
 
     game_state["last_updated"] = time.time()
+    room_store.update(room, len(game_state["players"]))
+    flush_broadcasts(room)
+    leave_room(LOBBY_ROOM)
     join_room(room)
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
-    update_room_list()
+    emit_frames(request.sid, [['game_state', full_state_payload(room, game_state)]])
+    schedule_room_list_update()
     print(f"Client {request.sid} joined room {room}")
 
 
 @socketio.on('disconnect')
-def on_disconnect(sid):
-    #sid = request.sid
+@instrument('disconnect')
+@routed('disconnect')
+def on_disconnect(reason=None):
+    if shutdown_flag:
+        return
+    sid = request.sid
+    compact_clients.discard(sid)
+    player_activity.pop(sid, None)
     room = player_group.get(sid)
     print(f"Client disconnected: {sid} from room {room}")
     if room and room in group_games:
         game_state = group_games[room]
         if sid in game_state["players"]:
             del game_state["players"][sid]
+            cancel_room_timer(room, "player:" + sid)
             game_state["last_updated"] = time.time()
         if sid in player_group:
             del player_group[sid]
-        socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
         if len(game_state["players"]) == 0:
-            del group_games[room]
-        update_room_list()
-
+            remove_room(room)
+        else:
+            room_store.update(room, len(game_state["players"]))
+            mark_state_dirty(room)
+        schedule_room_list_update()
 
-@socketio.on('time_request')
-def on_time_request():
-    if shutdown_flag:
-        return
-    update_player_activity(request.sid)
-    sid = request.sid
-    room = player_group.get(sid, "default")
-    game_state = group_games.get(room)
-    if not game_state:
-        emit('time_response', {"roundTimeRemaining": 0, "ovenTime": 0})
-        return
 
-    current_time = time.time()
+def room_clock(game_state, current_time):
     roundTimeRemaining = 0
     if game_state["current_phase"] == "round" and game_state["round_start_time"]:
         elapsed = current_time - game_state["round_start_time"]
         roundTimeRemaining = max(0, int(game_state["round_duration"] - elapsed))
-        if game_state["round"] == 3 and game_state["pending_orders"]:
-            orders_to_deliver = [order for order in game_state["pending_orders"] if order["arrival_time"] <= elapsed][
-                                :10]
-            if orders_to_deliver:
-                game_state["customer_orders"].extend(orders_to_deliver)
-                for order in orders_to_deliver:
-                    game_state["pending_orders"].remove(order)
-                    socketio.emit('new_order', order, room=room)
-                socketio.emit('game_state_update', {
-                    "customer_orders": game_state["customer_orders"],
-                    "pending_orders": game_state["pending_orders"]
-                }, room=room)
-                game_state["last_updated"] = current_time
     elif game_state["current_phase"] == "debrief" and game_state.get("debrief_start_time"):
         elapsed = current_time - game_state["debrief_start_time"]
         roundTimeRemaining = max(0, int(game_state["debrief_duration"] - elapsed))
@@ -277,14 +906,103 @@ def on_time_request():
     if game_state["oven_on"] and game_state["oven_timer_start"]:
         ovenTime = int(current_time - game_state["oven_timer_start"])
 
-    socketio.emit('time_response', {
+    # The raw timestamps let clients count down locally between ticks
+    return {
         "roundTimeRemaining": roundTimeRemaining,
         "ovenTime": ovenTime,
-        "phase": game_state["current_phase"]
-    }, room=room)
+        "phase": game_state["current_phase"],
+        "server_time": current_time,
+        "round_start_time": game_state["round_start_time"],
+        "round_duration": game_state["round_duration"],
+        "debrief_start_time": game_state.get("debrief_start_time"),
+        "debrief_duration": game_state["debrief_duration"],
+        "oven_timer_start": game_state["oven_timer_start"]
+    }
+
+
+def deliver_orders(room):
+    # Fires at the next round-3 arrival time, batching orders that fall due together
+    game_state = group_games.get(room)
+    arrivals = order_arrivals.get(room)
+    if shutdown_flag or not game_state or not arrivals or game_state["current_phase"] != "round":
+        return
+    current_time = time.time()
+    elapsed = current_time - game_state["round_start_time"]
+    delivered = []
+    while arrivals and arrivals[0][0] <= elapsed:
+        order = game_state["pending_orders"].pop(heapq.heappop(arrivals)[2])
+        if order is not None:
+            game_state["customer_orders"].append(order)
+            delivered.append(order)
+    if delivered:
+        game_state["last_updated"] = current_time
+        queue_broadcast(room, 'new_order', delivered)
+        mark_state_dirty(room)
+    schedule_order_delivery(room, game_state)
+
+
+def start_order_arrivals(room, game_state):
+    arrivals = [(order["arrival_time"], i, order["id"]) for i, order in enumerate(game_state["pending_orders"])]
+    heapq.heapify(arrivals)
+    order_arrivals[room] = arrivals
+    schedule_order_delivery(room, game_state)
+
+
+def schedule_order_delivery(room, game_state):
+    arrivals = order_arrivals.get(room)
+    if arrivals:
+        delay = game_state["round_start_time"] + arrivals[0][0] - time.time()
+        schedule_room_timer(room, "order_arrival", max(0, delay), deliver_orders, room)
+
+
+def clock_tick():
+    # One tick per room per second, instead of one reply per client poll
+    if shutdown_flag:
+        return
+    current_time = time.time()
+    for room, game_state in list(group_games.items()):
+        if game_state["current_phase"] == "waiting":
+            continue
+        socketio.emit('time_response', room_clock(game_state, current_time), room=room)
+    timer_wheel.schedule(CLOCK_TICK_INTERVAL - (time.time() % CLOCK_TICK_INTERVAL), clock_tick)
+
+
+timer_wheel.schedule(CLOCK_TICK_INTERVAL - (time.time() % CLOCK_TICK_INTERVAL), clock_tick)
+rt.start(timer_wheel.run)
+rt.start(probe_hub_lag, rt.sleep, lambda: not shutdown_flag)
+
+
+def schedule_oven_warning(room, game_state):
+    if len(game_state["oven"]):
+        baked = max(pizza["baking_time"] for pizza in game_state["oven"]) + time.time() - game_state["oven_timer_start"]
+        schedule_room_timer(room, "oven_warning", max(0, OVEN_BURN_WARNING - baked), warn_oven_burning, room)
+
+
+def warn_oven_burning(room):
+    game_state = group_games.get(room)
+    if game_state and game_state["oven_on"] and len(game_state["oven"]):
+        queue_broadcast(room, 'oven_warning', {"message": "Pizzas in the oven are about to burn!"})
+
+
+@socketio.on('time_request')
+@instrument('time_request')
+@routed('time_request')
+def on_time_request():
+    # Kept for clock resync on (re)connect; answers only the requesting client
+    if shutdown_flag:
+        return
+    update_player_activity(request.sid)
+    room = player_group.get(request.sid, "default")
+    game_state = group_games.get(room)
+    if not game_state:
+        emit('time_response', {"roundTimeRemaining": 0, "ovenTime": 0, "server_time": time.time()})
+        return
+    emit('time_response', room_clock(game_state, time.time()))
 
 
 @socketio.on('prepare_ingredient')
+@instrument('prepare_ingredient')
+@routed('prepare_ingredient')
 def on_prepare_ingredient(data):
     if shutdown_flag:
         return
@@ -298,14 +1016,16 @@ def on_prepare_ingredient(data):
         emit('error', {"message": "Invalid ingredient type"}, room=request.sid)
         return
     prepared_id = str(uuid.uuid4())[:8]
-    prepared_item = {"id": prepared_id, "type": ingredient_type, "prepared_by": room,"prepared_at": time.time()}
+    prepared_item = Ingredient(id=prepared_id, type=ingredient_type, prepared_by=room, prepared_at=time.time())
     game_state["prepared_ingredients"].append(prepared_item)
     game_state["last_updated"] = time.time()
-    socketio.emit('ingredient_prepared', prepared_item, room=room)
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
+    queue_broadcast(room, 'ingredient_prepared', prepared_item)
+    mark_state_dirty(room)
 
 
 @socketio.on('take_ingredient')
+@instrument('take_ingredient')
+@routed('take_ingredient')
 def on_take_ingredient(data):
     if shutdown_flag:
         return
@@ -317,9 +1037,8 @@ def on_take_ingredient(data):
     ingredient_id = data.get("ingredient_id")
     target_sid = data.get("target_sid")  # None for Round 1 self-builder
 
-    taken = next((ing for ing in game_state["prepared_ingredients"] if ing["id"] == ingredient_id), None)
+    taken = game_state["prepared_ingredients"].pop(ingredient_id)
     if taken:
-        game_state["prepared_ingredients"].remove(taken)
         # Use request.sid for Round 1, target_sid for Rounds 2+
         sid_to_update = target_sid if (game_state["round"] > 1 and target_sid) else request.sid
         if sid_to_update in game_state["players"]:
@@ -328,12 +1047,14 @@ def on_take_ingredient(data):
             emit('error', {"message": "Player not found."}, room=request.sid)
             return
         game_state["last_updated"] = time.time()
-        socketio.emit('ingredient_removed', {"ingredient_id": ingredient_id}, room=room)
-        socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
+        queue_broadcast(room, 'ingredient_removed', {"ingredient_id": ingredient_id})
+        mark_state_dirty(room)
     else:
         emit('error', {"message": "Ingredient not available."}, room=request.sid)
 
 @socketio.on('build_pizza')
+@instrument('build_pizza')
+@routed('build_pizza')
 def on_build_pizza(data):
     if shutdown_flag:
         return
@@ -367,14 +1088,14 @@ def on_build_pizza(data):
 
     pizza_id = str(uuid.uuid4())[:8]
     earliest_time = min(ing["prepared_at"] for ing in builder_ingredients)
-    pizza = {
-        "pizza_id": pizza_id,
-        "team": room,
-        "built_at": time.time(),
-        "baking_time": 0,
-        "ingredients": counts,
-        "build_start_time": earliest_time
-    }
+    pizza = Pizza(
+        pizza_id=pizza_id,
+        team=room,
+        built_at=time.time(),
+        baking_time=0,
+        ingredients=counts,
+        build_start_time=earliest_time
+    )
 
     # Pizza validation logic (unchanged)
     if game_state["round"] < 3:
@@ -386,66 +1107,43 @@ def on_build_pizza(data):
             current_time = time.time()
             lead_time = current_time - pizza["build_start_time"]
             pizza["status"] = "invalid"
-            pizza["emoji"] = '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🚫</span></div>'
+            pizza["look"] = LOOK_INVALID
             game_state["wasted_pizzas"].append(pizza)
-            game_state["lead_times"].append({
-                "pizza_id": pizza["pizza_id"],
-                "lead_time": lead_time,
-                "start_time": pizza["build_start_time"],
-                "status": "incomplete"
-            })
+            game_state["lead_times"].add(pizza["pizza_id"], lead_time, pizza["build_start_time"], "incomplete")
             socketio.emit('build_error', {"message": "Invalid combo: Wasted as incomplete."}, room=request.sid)
         else:
             pizza_type = "bacon" if counts["ham"] == 4 else "pineapple"
             pizza["type"] = pizza_type
-            pizza["emoji"] = (
-                '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓</span></div>'
-                if pizza_type == "bacon" else
-                '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🍍</span></div>'
-            )
+            pizza["look"] = PIZZA_LOOKS["ham"] if pizza_type == "bacon" else PIZZA_LOOKS["pineapple"]
             game_state["built_pizzas"].append(pizza)
-            socketio.emit('pizza_built', pizza, room=room)
+            queue_broadcast(room, 'pizza_built', pizza)
     else:
-        matched_order = next(
-            (order for order in game_state["customer_orders"]
-             if order["ingredients"]["base"] == counts["base"] and
-             order["ingredients"]["sauce"] == counts["sauce"] and
-             order["ingredients"]["ham"] == counts["ham"] and
-             order["ingredients"]["pineapple"] == counts["pineapple"]),
-            None
-        )
+        matched_order = game_state["customer_orders"].match(counts)
         if matched_order:
             pizza["type"] = matched_order["type"]
             pizza["order_id"] = matched_order["id"]
-            pizza["emoji"] = {
-                "ham": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓</span></div>',
-                "pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🍍</span></div>',
-                "ham & pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓🍍</span></div>',
-                "light ham": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓</span></div>',
-                "light pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🍍</span></div>',
-                "plain": '<div class="emoji-wrapper"><span class="emoji">🍕</span></div>',
-                "heavy ham": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓</span></div>',
-                "heavy pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🍍</span></div>'
-            }[matched_order["type"]]
+            pizza["look"] = PIZZA_LOOKS[matched_order["type"]]
             game_state["customer_orders"].remove(matched_order)
             game_state["built_pizzas"].append(pizza)
-            socketio.emit('order_fulfilled', {"order_id": matched_order["id"]}, room=room)
-            socketio.emit('pizza_built', pizza, room=room)
+            queue_broadcast(room, 'order_fulfilled', {"order_id": matched_order["id"]})
+            queue_broadcast(room, 'pizza_built', pizza)
         else:
             pizza["status"] = "unmatched"
-            pizza["emoji"] = '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">❓</span></div>'
+            pizza["look"] = LOOK_UNMATCHED
             game_state["wasted_pizzas"].append(pizza)
             socketio.emit('build_error', {"message": "Pizza doesn't match any current order."}, room=request.sid)
 
     # Clear the builder
     game_state["players"][target_sid]["builder_ingredients"] = []
     if game_state["round"] > 1:
-        socketio.emit('clear_shared_builder', {"player_sid": target_sid}, room=room)
+        queue_broadcast(room, 'clear_shared_builder', {"player_sid": target_sid})
 
     game_state["last_updated"] = time.time()
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
+    mark_state_dirty(room)
 
 @socketio.on('move_to_oven')
+@instrument('move_to_oven')
+@routed('move_to_oven')
 def on_move_to_oven(data):
     if shutdown_flag:
         return
@@ -458,19 +1156,21 @@ def on_move_to_oven(data):
         emit('oven_error', {"message": "Oven is on; cannot add pizzas while on."}, room=request.sid)
         return
     pizza_id = data.get("pizza_id")
-    pizza = next((p for p in game_state["built_pizzas"] if p["pizza_id"] == pizza_id), None)
+    pizza = game_state["built_pizzas"].get(pizza_id)
     if not pizza or len(game_state["oven"]) >= game_state["max_pizzas_in_oven"]:
         emit('oven_error', {"message": "Oven issue: Pizza not found or full!"}, room=request.sid)
         return
-    game_state["built_pizzas"].remove(pizza)
+    game_state["built_pizzas"].pop(pizza_id)
     pizza["oven_start"] = time.time()
     game_state["oven"].append(pizza)
     game_state["last_updated"] = time.time()
-    socketio.emit('pizza_moved_to_oven', pizza, room=room)
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
+    queue_broadcast(room, 'pizza_moved_to_oven', pizza)
+    mark_state_dirty(room)
 
 
 @socketio.on('toggle_oven')
+@instrument('toggle_oven')
+@routed('toggle_oven')
 def toggle_oven(data):
     if shutdown_flag:
         return
@@ -485,7 +1185,8 @@ def toggle_oven(data):
         game_state["oven_on"] = True
         game_state["oven_timer_start"] = time.time()
         game_state["last_updated"] = time.time()
-        socketio.emit('oven_toggled', {"state": "on"}, room=room)
+        queue_broadcast(room, 'oven_toggled', {"state": "on"})
+        schedule_oven_warning(room, game_state)
     elif desired_state == "off" and game_state["oven_on"]:
         elapsed = time.time() - game_state["oven_timer_start"]
         for pizza in game_state["oven"]:
@@ -505,34 +1206,92 @@ def toggle_oven(data):
                 pizza["status"] = "burnt"
                 status = "incomplete"
                 game_state["wasted_pizzas"].append(pizza)
-            game_state["lead_times"].append({
-            "pizza_id": pizza["pizza_id"],
-            "lead_time": lead_time,
-            "status": status
-            })
-        game_state["oven"] = []
+            game_state["lead_times"].add(pizza["pizza_id"], lead_time, pizza["build_start_time"], status)
+        game_state["oven"].clear()
         game_state["oven_on"] = False
         game_state["oven_timer_start"] = None
+        cancel_room_timer(room, "oven_warning")
         
         game_state["last_updated"] = time.time()
-        socketio.emit('oven_toggled', {"state": "off"}, room=room)
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
+        queue_broadcast(room, 'oven_toggled', {"state": "off"})
+    mark_state_dirty(room)
+
+
+@socketio.on('request_full_state')
+@instrument('request_full_state')
+@routed('request_full_state')
+def on_request_full_state():
+    # Sent by a client whose patch base no longer matches its local version
+    if shutdown_flag:
+        return
+    update_player_activity(request.sid)
+    room = player_group.get(request.sid)
+    game_state = group_games.get(room)
+    if not game_state:
+        return
+    flush_broadcasts(room)
+    emit_frames(request.sid, [['game_state', full_state_payload(room, game_state)]])
+
+
+@socketio.on('request_round_analytics')
+@instrument('request_round_analytics')
+@routed('request_round_analytics')
+def on_request_round_analytics(data):
+    # Re-opening a debrief reads the analytics computed when that round ended
+    if shutdown_flag:
+        return
+    update_player_activity(request.sid)
+    room = player_group.get(request.sid)
+    analytics = round_analytics.get(room, {}).get(data.get("round"))
+    emit('round_analytics', {"round": data.get("round"), "analytics": analytics})
 
 
 @socketio.on('request_room_list')
+@instrument('request_room_list')
 def on_request_room_list():
+    # Subscribes the client to lobby updates until it joins a room
     if shutdown_flag:
         return
     update_player_activity(request.sid)
-    update_room_list()
+    join_room(LOBBY_ROOM)
+    emit('room_list', {"rooms": lobby_rooms(), "high_scores": get_high_scores()}, room=request.sid)
+
+
+# What this worker last sent the lobby, so single-worker updates only carry what changed
+lobby_snapshot = {"rooms": {}, "high_scores": None}
+
+
+def lobby_rooms():
+    return {r: count for r, count in room_store.room_counts().items() if count > 0}
 
 
 def update_room_list():
-    room_list = {r: len(group_games[r]["players"]) for r in group_games if len(group_games[r]["players"]) > 0}
-    socketio.emit('room_list', {"rooms": room_list, "high_scores": get_high_scores()})
+    rooms = lobby_rooms()
+    high_scores = get_high_scores()
+    if room_store.shared:
+        # Every worker updates the lobby, so one worker's last-sent list is not what the clients
+        # hold: send the whole (at most MAX_ROOMS) list instead of a diff against it
+        lobby_snapshot["rooms"] = rooms
+        lobby_snapshot["high_scores"] = dict(high_scores)
+        socketio.emit('room_list', {"rooms": rooms, "high_scores": high_scores}, room=LOBBY_ROOM)
+        return
+    previous = lobby_snapshot["rooms"]
+    update = {
+        "added": {r: count for r, count in rooms.items() if r not in previous},
+        "changed": {r: count for r, count in rooms.items() if r in previous and previous[r] != count},
+        "removed": [r for r in previous if r not in rooms]
+    }
+    if high_scores != lobby_snapshot["high_scores"]:
+        update["high_scores"] = high_scores
+    lobby_snapshot["rooms"] = rooms
+    lobby_snapshot["high_scores"] = dict(high_scores)
+    if update["added"] or update["changed"] or update["removed"] or "high_scores" in update:
+        socketio.emit('room_list_update', update, room=LOBBY_ROOM)
 
 
 @socketio.on('start_round')
+@instrument('start_round')
+@routed('start_round')
 def on_start_round(data):
     if shutdown_flag:
         return
@@ -544,45 +1303,42 @@ def on_start_round(data):
     if game_state["current_phase"] != "waiting":
         return
 
-    # Kill existing round timer if still running (cleanup from late starts)
-    if game_state.get("round_timer_thread"):
-        try:
-            game_state["round_timer_thread"].kill()
-        except Exception as e:
-            print(f"Could not kill previous round timer: {e}")
-        game_state["round_timer_thread"] = None
+    # Drop any deadline left over from a late start
+    cancel_round_timers(room)
 
     # Initialize round state
     game_state["current_phase"] = "round"
     game_state["round_start_time"] = time.time()
-    game_state["prepared_ingredients"] = []
-    game_state["built_pizzas"] = []
-    game_state["oven"] = []
-    game_state["completed_pizzas"] = []
-    game_state["wasted_pizzas"] = []
+    game_state["prepared_ingredients"].clear()
+    game_state["built_pizzas"].clear()
+    game_state["oven"].clear()
+    game_state["completed_pizzas"].clear()
+    game_state["wasted_pizzas"].clear()
     game_state["oven_on"] = False
     game_state["oven_timer_start"] = None
-    game_state["customer_orders"] = []
-    game_state["pending_orders"] = []
+    game_state["customer_orders"].clear()
+    game_state["pending_orders"].clear()
+    game_state["lead_times"] = LeadTimes()
     for sid in game_state["players"]:
         game_state["players"][sid]["builder_ingredients"] = []
     game_state["last_updated"] = time.time()
+    round_timelines[room] = RoundTimeline(game_state["round"], game_state["round_start_time"])
+    round_timelines[room].record(game_state["round_start_time"], game_state)
 
     # Generate customer orders for Round 3
     if game_state["round"] == 3:
-        game_state["pending_orders"] = generate_customer_orders(game_state["round_duration"])
+        game_state["pending_orders"].extend(generate_customer_orders(game_state["round_duration"]))
+        start_order_arrivals(room, game_state)
 
     # Notify clients
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
-    socketio.emit('round_started', {
+    mark_state_dirty(room)
+    # The orders travel in the state patch, so the ones due at once aren't sent twice
+    queue_broadcast(room, 'round_started', {
         "round": game_state["round"],
-        "duration": game_state["round_duration"],
-        "customer_orders": game_state["customer_orders"]
-    }, room=room)
+        "duration": game_state["round_duration"]
+    })
 
-    # Start the round timer
-    thread = eventlet.spawn(round_timer, game_state["round_duration"], room)
-    game_state["round_timer_thread"] = thread
+    schedule_room_timer(room, "round_end", game_state["round_duration"], end_round, room)
 
 
 def generate_customer_orders(round_duration):
@@ -599,18 +1355,12 @@ def generate_customer_orders(round_duration):
     orders = []
     max_order_time = round_duration - 45
     for i in range(15):
-        order = {"id": str(uuid.uuid4())[:8], **random.choice(order_types)}
+        order = Order(id=str(uuid.uuid4())[:8], **random.choice(order_types))
         order["arrival_time"] = (i * (max_order_time / 14))
         orders.append(order)
     return orders
 
 
-def round_timer(duration, room):
-    eventlet.sleep(duration)
-    if not shutdown_flag:
-        end_round(room)
-
-
 def end_round(room):
     if shutdown_flag:
         return
@@ -631,29 +1381,20 @@ def end_round(room):
             pizza["status"] = "undercooked"
             game_state["wasted_pizzas"].append(pizza)
 
-            game_state["lead_times"].append({
-                "pizza_id": pizza["pizza_id"],
-                "lead_time": lead_time,
-                "status": "incomplete"
-            })
+            game_state["lead_times"].add(pizza["pizza_id"], lead_time, pizza["build_start_time"], "incomplete")
 
         # Reset oven state
-        game_state["oven"] = []
+        game_state["oven"].clear()
         game_state["oven_on"] = False
         game_state["oven_timer_start"] = None
-        socketio.emit('oven_toggled', {"state": "off"}, room=room)
+        queue_broadcast(room, 'oven_toggled', {"state": "off"})
+
+    cancel_round_timers(room)
 
     # Move to debrief phase
     game_state["current_phase"] = "debrief"
     game_state["debrief_start_time"] = current_time
 
-    # Kill previous debrief timer if it exists
-    if game_state.get("debrief_timer_thread"):
-        try:
-            game_state["debrief_timer_thread"].kill()
-        except Exception as e:
-            print(f"Could not kill previous debrief timer: {e}")
-
     leftover_ingredients = len(game_state["prepared_ingredients"])
     unsold_pizzas = game_state["built_pizzas"]
     unsold_count = len(unsold_pizzas)
@@ -677,30 +1418,35 @@ def end_round(room):
         "unsold_pizzas_count": unsold_count,
         "ingredients_left_count": leftover_ingredients,
         "score": score,
-        "lead_times": game_state["lead_times"]
+        "lead_times": game_state["lead_times"].samples(),
+        "lead_time_stats": game_state["lead_times"].summary()
     }
     if game_state["round"] == 3:
         result["fulfilled_orders_count"] = fulfilled_orders
         result["remaining_orders_count"] = remaining_orders
         result["unmatched_pizzas_count"] = unmatched_count
 
+    timeline = round_timelines.pop(room, None)
+    if timeline is not None:
+        timeline.record(current_time, game_state)
+        elapsed = min(current_time - game_state["round_start_time"], game_state["round_duration"])
+        analytics = analyze(timeline, round(elapsed), result["lead_times"])
+        round_analytics.setdefault(room, {})[game_state["round"]] = analytics
+        result["analytics"] = analytics
+
     
     game_state["last_updated"] = time.time()
-    socketio.emit('game_state', sanitize_game_state_for_emit(game_state), room=room)
-    socketio.emit('round_ended', result, room=room)
-
-    thread = eventlet.spawn(debrief_timer, game_state["debrief_duration"], room)
-    game_state["debrief_timer_thread"] = thread
-    save_high_score(room, game_state["round"], score)
-
+    mark_state_dirty(room)
+    queue_broadcast(room, 'round_ended', result)
 
-def debrief_timer(duration, room):
-    eventlet.sleep(duration)
-    if not shutdown_flag:
-        reset_round(room)
+    schedule_room_timer(room, "debrief_end", game_state["debrief_duration"], reset_round, room)
+    save_round_result(room, game_state["round"], result)
+    schedule_room_list_update()
 
 
 def reset_round(room):
+    if shutdown_flag:
+        return
     game_state = group_games.get(room)
     if not game_state or game_state["current_phase"] != "debrief":
         return
@@ -710,8 +1456,52 @@ def reset_round(room):
         game_state["round"] = 1  # Reset to Round 1 after Round 3
     game_state["debrief_start_time"] = None
     game_state["last_updated"] = time.time()
-    socketio.emit('game_reset', sanitize_game_state_for_emit(game_state), room=room)
+    mark_state_dirty(room)
+    flush_broadcasts(room)
+    emit_frames(room, [['game_reset', full_state_payload(room, game_state)]])
+
+
+
+def recover_rooms():
+    # Rebuilds the rooms this process had logged before a restart; clients rejoin with new sids
+    for room in room_log.rooms():
+        state = room_log.recover(room, SYNCED_COLLECTIONS)
+        if state is None or room in group_games or not room_store.claim(room, WORKER_ID):
+            continue
+        game_state = game_state_from_log(state)
+        for player in game_state["players"].values():
+            game_state["prepared_ingredients"].extend(player["builder_ingredients"])
+        game_state["players"] = {}
+        group_games[room] = game_state
+        room_sync[room] = {"version": state["version"], "shadow": state_shadow(game_state), "snapshot": None}
+        current_time = time.time()
+        if game_state["current_phase"] == "round":
+            remaining = game_state["round_start_time"] + game_state["round_duration"] - current_time
+            schedule_room_timer(room, "round_end", max(0, remaining), end_round, room)
+            start_order_arrivals(room, game_state)
+            snapshot, entries = room_log.round_log(room)
+            if snapshot is not None:
+                round_timelines[room] = timeline_from_log(snapshot, entries, SYNCED_COLLECTIONS)
+            if game_state["oven_on"]:
+                schedule_oven_warning(room, game_state)
+        elif game_state["current_phase"] == "debrief":
+            remaining = game_state["debrief_start_time"] + game_state["debrief_duration"] - current_time
+            schedule_room_timer(room, "debrief_end", max(0, remaining), reset_round, room)
+        # Nobody is in the room until someone rejoins; drop it if that doesn't happen
+        schedule_room_timer(room, "recovery_grace", PLAYER_TIMEOUT, expire_unclaimed_room, room)
+        schedule_room_timer(room, "room_expiry", ROOM_TIMEOUT, expire_room, room)
+        print(f"Recovered room {room} ({game_state['current_phase']}, round {game_state['round']})")
+
+
+def expire_unclaimed_room(room):
+    game_state = group_games.get(room)
+    if game_state is not None and not game_state["players"]:
+        print(f"Removing recovered room {room} nobody rejoined")
+        remove_room(room)
+
 
+if room_log is not None:
+    recover_rooms()
 
 
 # List of known search engine User-Agent substrings
@@ -727,19 +1517,22 @@ SEARCH_ENGINE_AGENTS = [
     "Slurp", "DuckDuckBot", "Baiduspider", "YandexBot",
     "Sogou", "Exabot", "facebot", "ia_archiver"
 ]
+# One pass over the User-Agent instead of a substring test per agent
+SEARCH_ENGINE_MATCHER = re.compile("|".join(map(re.escape, SEARCH_ENGINE_AGENTS)))
 
 @app.route('/search-engine-info')
 def search_engine_info():
-    # Get the User-Agent header from the request
-    user_agent = request.headers.get('User-Agent', '')
-
     # Check if the User-Agent matches any known search engine bots
-    is_search_engine = any(agent in user_agent for agent in SEARCH_ENGINE_AGENTS)
-
-    if not is_search_engine:
+    if not SEARCH_ENGINE_MATCHER.search(request.headers.get('User-Agent', '')):
         # Return a 403 Forbidden response for non-search-engine users
         return "Access Denied: This page is for search engines only.", 403
 
+    response = cached_page("search-engine-info", render_search_engine_info)
+    response.vary.add("User-Agent")
+    return response
+
+
+def render_search_engine_info():
     # Instructions and metadata for search engines
     info = {
         "title": "Kanban Pizza - Game Instructions and Information",
@@ -0,0 +1,135 @@
+import functools
+import time
+from bisect import bisect_left
+
+from socketio import packet
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)  # Seconds
+HUB_LAG_INTERVAL = 1  # Seconds between event-loop lag probes
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() only bumps counters."""
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class EventStats:
+    __slots__ = ("calls", "errors", "latency", "emitted", "emitted_bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.emitted = 0
+        self.emitted_bytes = 0
+
+
+# Per event name; entries are created once, when a handler is decorated or an event is first sent
+events = {}
+hub_lag = Histogram()
+
+
+def event_stats(event):
+    stats = events.get(event)
+    if stats is None:
+        stats = events[event] = EventStats()
+    return stats
+
+
+def instrument(event):
+    # Counts calls, errors and wall-clock latency of a Socket.IO handler
+    stats = event_stats(event)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args):
+            stats.calls += 1
+            start = time.perf_counter()
+            try:
+                return handler(*args)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.latency.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def counting_packet(packet_class):
+    """Packet class that records each outgoing event and its encoded size.
+
+    A broadcast is encoded once for all its recipients, so counts are per emit.
+    """
+    class CountingPacket(packet_class):
+        def encode(self):
+            encoded = super().encode()
+            if self.packet_type in (packet.EVENT, packet.BINARY_EVENT) and self.data:
+                stats = event_stats(self.data[0])
+                stats.emitted += 1
+                if isinstance(encoded, list):
+                    stats.emitted_bytes += sum(len(part) for part in encoded)
+                else:
+                    stats.emitted_bytes += len(encoded)
+            return encoded
+    return CountingPacket
+
+
+async def probe_hub_lag(sleep, running=lambda: True):
+    # How late the event loop wakes us up is how long other tasks held it
+    while running():
+        start = time.perf_counter()
+        await sleep(HUB_LAG_INTERVAL)
+        hub_lag.observe(max(0.0, time.perf_counter() - start - HUB_LAG_INTERVAL))
+
+
+def _histogram_lines(name, histogram, labels=""):
+    prefix = labels + "," if labels else ""
+    suffix = "{" + labels + "}" if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{suffix} {histogram.total}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+def render(gauges):
+    """Prometheus text exposition of the event stats, hub lag and the given gauges."""
+    lines = []
+    for name, kind, help_text, field in (
+            ("kanbanpizza_handler_calls_total", "counter", "Socket.IO handler calls.", "calls"),
+            ("kanbanpizza_handler_errors_total", "counter", "Socket.IO handler calls that raised.", "errors"),
+            ("kanbanpizza_emitted_messages_total", "counter", "Events emitted, per emit call.", "emitted"),
+            ("kanbanpizza_emitted_bytes_total", "counter", "Encoded bytes of emitted events.", "emitted_bytes")):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for event, stats in sorted(events.items()):
+            lines.append(f'{name}{{event="{event}"}} {getattr(stats, field)}')
+    lines.append("# HELP kanbanpizza_handler_latency_seconds Socket.IO handler latency.")
+    lines.append("# TYPE kanbanpizza_handler_latency_seconds histogram")
+    for event, stats in sorted(events.items()):
+        if stats.calls:
+            lines.extend(_histogram_lines("kanbanpizza_handler_latency_seconds", stats.latency, f'event="{event}"'))
+    lines.append("# HELP kanbanpizza_hub_lag_seconds Event loop wake-up delay.")
+    lines.append("# TYPE kanbanpizza_hub_lag_seconds histogram")
+    lines.extend(_histogram_lines("kanbanpizza_hub_lag_seconds", hub_lag))
+    for name, (help_text, value) in gauges.items():
+        lines.append(f"# HELP kanbanpizza_{name} {help_text}")
+        lines.append(f"# TYPE kanbanpizza_{name} gauge")
+        lines.append(f"kanbanpizza_{name} {value}")
+    return "\n".join(lines) + "\n"
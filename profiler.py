@@ -0,0 +1,62 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+MAX_PROFILE_SECONDS = 300
+
+
+class SamplingProfiler:
+    """Samples whatever the server's event-loop thread is running, from a separate OS thread.
+
+    Under eventlet every greenlet (and the hub itself) runs on that one thread, so its current
+    frame is the greenlet holding the loop at that instant; an idle hub shows up as its poll
+    call. Nothing runs until start() and the sampler exits when its time is up. Output is in
+    the collapsed-stack format flamegraph.pl and speedscope read: "root;...;leaf count".
+    """
+
+    def __init__(self, out_dir, thread_module=threading, sleep=time.sleep):
+        self.out_dir = os.path.abspath(out_dir)
+        self.thread_module = thread_module
+        self.sleep = sleep
+        self.target = thread_module.get_ident()
+        self.sampler = None
+        self.last_path = None
+
+    @property
+    def running(self):
+        return self.sampler is not None and self.sampler.is_alive()
+
+    def start(self, seconds):
+        if self.running:
+            return None
+        seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, time.strftime("profile-%Y%m%d-%H%M%S.collapsed"))
+        self.sampler = self.thread_module.Thread(target=self._sample, args=(seconds, path), daemon=True)
+        self.sampler.start()
+        return path
+
+    def _sample(self, seconds, path):
+        stacks = collections.Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                stacks[collapse(frame)] += 1
+            self.sleep(PROFILE_INTERVAL)
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.last_path = path
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
@@ -0,0 +1,140 @@
+import json
+import sqlite3
+import threading
+import time
+
+LOG_SNAPSHOT_EVERY = 100  # Logged frame batches between periodic snapshots of a room
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS room_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    room TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS room_log_room_seq ON room_log (room, seq);
+"""
+
+
+class RoomLog:
+    """Append-only SQLite log of each room's broadcast frames, with state snapshots.
+
+    Rows are buffered by append()/snapshot() and written in one transaction per write().
+    A "round_snapshot" taken at round start is the base for replaying that round; rows
+    before it are pruned when it is written, so the log holds at most the current round
+    (and whatever happened since) per room.
+    """
+
+    def __init__(self, path, lock=None):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)  # Writes are serialized by write_lock
+        # The writer's batches run in a worker thread and the shutdown flush on the event loop; pass
+        # an OS-thread lock (rt.threading.Lock()) if the threading module may be monkey patched
+        self.write_lock = lock or threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.pending = []
+        self.since_snapshot = {}
+
+    def append(self, room, frames, version):
+        self.pending.append(("insert", (room, "frames", version, time.time(), json.dumps(frames))))
+        self.since_snapshot[room] = self.since_snapshot.get(room, 0) + 1
+
+    def needs_snapshot(self, room):
+        return self.since_snapshot.get(room, LOG_SNAPSHOT_EVERY) >= LOG_SNAPSHOT_EVERY
+
+    def snapshot(self, room, state, version, round_start=False):
+        kind = "round_snapshot" if round_start else "snapshot"
+        self.pending.append(("insert", (room, kind, version, time.time(), json.dumps(state))))
+        self.since_snapshot[room] = 0
+
+    def drop(self, room):
+        self.pending.append(("drop", room))
+        self.since_snapshot.pop(room, None)
+
+    def take_pending(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    def write(self, operations):
+        with self.write_lock, self.db:
+            for operation, args in operations:
+                if operation == "drop":
+                    self.db.execute("DELETE FROM room_log WHERE room = ?", (args,))
+                    continue
+                seq = self.db.execute(
+                    "INSERT INTO room_log (room, kind, version, ts, data) VALUES (?, ?, ?, ?, ?)", args).lastrowid
+                if args[1] == "round_snapshot":
+                    self.db.execute("DELETE FROM room_log WHERE room = ? AND seq < ?", (args[0], seq))
+
+    def _rows(self, room, kinds):
+        # Reads get their own connection so they never share one with a write in progress
+        reader = sqlite3.connect(self.path)
+        try:
+            base = reader.execute(
+                f"SELECT seq, version, ts, data FROM room_log WHERE room = ? AND kind IN ({','.join('?' * len(kinds))})"
+                " ORDER BY seq DESC LIMIT 1", (room, *kinds)).fetchone()
+            if base is None:
+                return None, []
+            entries = reader.execute(
+                "SELECT ts, data FROM room_log WHERE room = ? AND kind = 'frames' AND seq > ? ORDER BY seq",
+                (room, base[0])).fetchall()
+        finally:
+            reader.close()
+        state = json.loads(base[3])
+        state["version"] = base[1]
+        return {"ts": base[2], "state": state}, [(ts, json.loads(data)) for ts, data in entries]
+
+    def rooms(self):
+        reader = sqlite3.connect(self.path)
+        try:
+            return [room for (room,) in reader.execute("SELECT DISTINCT room FROM room_log")]
+        finally:
+            reader.close()
+
+    def recover(self, room, keys):
+        """Latest state of a room: its newest snapshot with every later patch applied."""
+        snapshot, entries = self._rows(room, ("snapshot", "round_snapshot"))
+        if snapshot is None:
+            return None
+        state = snapshot["state"]
+        for _ in replay_frames(state, entries, keys):
+            pass
+        return state
+
+    def round_log(self, room):
+        """The room's round-start snapshot and every frame batch logged after it."""
+        return self._rows(room, ("round_snapshot",))
+
+
+def apply_patch(state, patch, keys):
+    state.update(patch.get("set", {}))
+    for name, gone in patch.get("removed", {}).items():
+        gone = set(gone)
+        state[name] = [item for item in state[name] if item[keys[name]] not in gone]
+    for name, items in patch.get("added", {}).items():
+        fresh = {item[keys[name]] for item in items}
+        state[name] = [item for item in state[name] if item[keys[name]] not in fresh] + items
+    for sid, player in patch.get("players", {}).items():
+        if player is None:
+            state["players"].pop(sid, None)
+        else:
+            state["players"][sid] = player
+    if "lead_times" in patch:
+        state["lead_times"] = patch["lead_times"]
+    state["version"] = patch["version"]
+
+
+def replay_frames(state, entries, keys):
+    """Steps through logged frames in order, patching state in place.
+
+    Yields (timestamp, event, data, state) per frame, so a round can be replayed
+    deterministically from its round_snapshot.
+    """
+    for ts, frames in entries:
+        for event, data in frames:
+            if event == "state_patch" and data["version"] > state.get("version", -1):
+                apply_patch(state, data, keys)
+            yield ts, event, data, state
@@ -0,0 +1,145 @@
+import json
+import time
+
+
+class MemoryRoomStore:
+    """Single-process room directory: every room is owned by this worker."""
+    shared = False
+
+    def __init__(self):
+        self.rooms = {}
+
+    def claim(self, room, worker_id):
+        owner = self.rooms.setdefault(room, {"owner": worker_id, "players": 0})["owner"]
+        return owner == worker_id
+
+    def owner(self, room):
+        entry = self.rooms.get(room)
+        return entry["owner"] if entry else None
+
+    def update(self, room, players):
+        if room in self.rooms:
+            self.rooms[room]["players"] = players
+
+    def release(self, room):
+        self.rooms.pop(room, None)
+
+    def room_count(self):
+        return len(self.rooms)
+
+    def room_counts(self):
+        return {room: entry["players"] for room, entry in self.rooms.items()}
+
+    def heartbeat(self, worker_id, ttl):
+        pass
+
+    def alive(self, worker_id):
+        return True
+
+    def forward(self, worker_id, message):
+        raise RuntimeError("MemoryRoomStore has a single worker; nothing to forward to.")
+
+    def listen(self, worker_id, handler):
+        pass
+
+
+class RedisRoomStore:
+    """Room directory shared through Redis so several workers can split the rooms.
+
+    Each room is owned by the worker that created it; that worker keeps the live state and
+    runs the room's timers, and other workers forward the room's events to it over pub/sub.
+    Works with any client exposing the redis-py API (e.g. a fakeredis stand-in).
+    """
+    shared = True
+
+    def __init__(self, client, prefix="kanbanpizza"):
+        self.client = client
+        self.rooms_key = f"{prefix}:rooms"
+        self.worker_key = f"{prefix}:worker:"
+        self.forward_channel = f"{prefix}:forward:"
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def _entry(self, room):
+        raw = self.client.hget(self.rooms_key, room)
+        return json.loads(raw) if raw else None
+
+    def claim(self, room, worker_id):
+        entry = json.dumps({"owner": worker_id, "players": 0})
+        if self.client.hsetnx(self.rooms_key, room, entry):
+            return True
+        from redis.exceptions import WatchError
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    # Compare-and-set: the takeover only lands if nobody changed the entry meanwhile
+                    pipe.watch(self.rooms_key)
+                    raw = pipe.hget(self.rooms_key, room)
+                    current = json.loads(raw) if raw else None
+                    if current is not None and (current["owner"] == worker_id or self.alive(current["owner"])):
+                        pipe.unwatch()
+                        return current["owner"] == worker_id
+                    # The previous owner stopped heartbeating; its rooms are gone with it
+                    pipe.multi()
+                    pipe.hset(self.rooms_key, room, entry)
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def owner(self, room):
+        entry = self._entry(room)
+        if entry is None or not self.alive(entry["owner"]):
+            return None
+        return entry["owner"]
+
+    def update(self, room, players):
+        entry = self._entry(room)
+        if entry is not None:
+            entry["players"] = players
+            self.client.hset(self.rooms_key, room, json.dumps(entry))
+
+    def release(self, room):
+        self.client.hdel(self.rooms_key, room)
+
+    def room_count(self):
+        return len(self.room_counts())
+
+    def room_counts(self):
+        rooms = {}
+        alive = {}
+        for room, raw in self.client.hgetall(self.rooms_key).items():
+            entry = json.loads(raw)
+            owner = entry["owner"]
+            if owner not in alive:
+                alive[owner] = self.alive(owner)
+            if alive[owner]:
+                rooms[room.decode() if isinstance(room, bytes) else room] = entry["players"]
+        return rooms
+
+    def heartbeat(self, worker_id, ttl):
+        self.client.set(self.worker_key + worker_id, time.time(), ex=ttl)
+
+    def alive(self, worker_id):
+        return bool(self.client.exists(self.worker_key + worker_id))
+
+    def forward(self, worker_id, message):
+        self.client.publish(self.forward_channel + worker_id, json.dumps(message))
+
+    def listen(self, worker_id, handler):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.forward_channel + worker_id)
+        for message in pubsub.listen():
+            if message and message.get("type") == "message":
+                handler(json.loads(message["data"]))
+
+
+def room_store_from_url(url):
+    if not url:
+        return MemoryRoomStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRoomStore.from_url(url)
+    raise ValueError(f"Unsupported ROOM_STORE_URL: {url}")
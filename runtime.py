@@ -0,0 +1,152 @@
+import asyncio
+import functools
+import threading
+import time
+
+
+class EventletRuntime:
+    """Runs the server's background tasks as green threads on the eventlet hub.
+
+    Tasks are written once as coroutines for both runtimes. Under eventlet nothing awaits them
+    on an event loop; _drive() steps each one and performs what it awaits (a sleep, a call in
+    tpool, a queue get) as the matching green, blocking call.
+    """
+    name = "eventlet"
+
+    def __init__(self):
+        import eventlet
+        import eventlet.queue
+        import eventlet.tpool
+        self.eventlet = eventlet
+        # Real OS threads and sleep, for work that must not run on the hub (e.g. the profiler)
+        self.threading = eventlet.patcher.original("threading")
+        self.thread_sleep = eventlet.patcher.original("time").sleep
+
+    def start(self, task, *args):
+        self.eventlet.spawn(self._drive, task(*args))
+
+    def _drive(self, coroutine):
+        value, error = None, None
+        while True:
+            try:
+                step = coroutine.send(value) if error is None else coroutine.throw(error)
+            except StopIteration:
+                return
+            value, error = None, None
+            try:
+                value = step.call(*step.args)
+            except Exception as e:
+                error = e
+
+    def sleep(self, seconds):
+        return _Step(self.eventlet.sleep, seconds)
+
+    def in_thread(self, fn, *args):
+        return _Step(self.eventlet.tpool.execute, fn, *args)
+
+    def get(self, queue):
+        return _Step(queue.get)
+
+    def queue(self):
+        return self.eventlet.queue.LightQueue()
+
+    def call_later(self, delay, fn, *args):
+        return self.eventlet.spawn_after(delay, fn, *args)
+
+    def blocking(self, fn, *args):
+        # From a Flask route, which runs on the hub
+        return self.eventlet.tpool.execute(fn, *args)
+
+    def on_loop(self, fn, *args):
+        return fn(*args)
+
+    def listen(self, fn, *args):
+        # Long-lived blocking loops (Redis pub/sub) run green; wsgi.py monkey patches when Redis is used
+        self.eventlet.spawn(fn, *args)
+
+    def threadsafe(self, fn):
+        return fn
+
+
+class _Step:
+    __slots__ = ("call", "args")
+
+    def __init__(self, call, *args):
+        self.call = call
+        self.args = args
+
+    def __await__(self):
+        return (yield self)
+
+
+class AsyncioRuntime:
+    """Runs background tasks on the asyncio event loop serving the ASGI app.
+
+    Blocking calls go to the loop's default thread pool. Flask routes already run in the ASGI
+    server's threads, so blocking() calls straight through and on_loop() hops back to the loop
+    for anything that touches game state. Tasks started before the loop runs (at import) are
+    launched by startup().
+    """
+    name = "asyncio"
+    threading = threading
+    thread_sleep = staticmethod(time.sleep)
+
+    def __init__(self):
+        self.loop = None
+        self.waiting = []
+        self.tasks = set()  # Strong references, so running tasks are not garbage collected
+
+    def startup(self):
+        self.loop = asyncio.get_running_loop()
+        waiting, self.waiting = self.waiting, []
+        for launch, fn, args in waiting:
+            launch(fn, *args)
+
+    def start(self, task, *args):
+        if self.loop is None:
+            self.waiting.append((self.start, task, args))
+            return
+        running = self.loop.create_task(task(*args))
+        self.tasks.add(running)
+        running.add_done_callback(self.tasks.discard)
+
+    def sleep(self, seconds):
+        return asyncio.sleep(seconds)
+
+    def in_thread(self, fn, *args):
+        return self.loop.run_in_executor(None, functools.partial(fn, *args))
+
+    def get(self, queue):
+        return queue.get()
+
+    def queue(self):
+        return asyncio.Queue()
+
+    def call_later(self, delay, fn, *args):
+        return self.loop.call_later(delay, fn, *args)
+
+    def blocking(self, fn, *args):
+        return fn(*args)
+
+    def on_loop(self, fn, *args):
+        async def call():
+            return fn(*args)
+        return asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+    def listen(self, fn, *args):
+        if self.loop is None:
+            self.waiting.append((self.listen, fn, args))
+            return
+        threading.Thread(target=fn, args=args, daemon=True).start()
+
+    def threadsafe(self, fn):
+        # For callbacks made from listen() threads
+        return lambda *args: self.loop.call_soon_threadsafe(fn, *args)
+
+
+def runtime_for(mode):
+    if mode == "eventlet":
+        return EventletRuntime()
+    if mode == "asyncio":
+        return AsyncioRuntime()
+    raise ValueError(f"Unsupported ASYNC_MODE: {mode}")
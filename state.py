@@ -0,0 +1,412 @@
+import json
+import time
+import uuid
+from array import array
+from bisect import insort
+
+
+class Record:
+    """Slotted record that keeps the dict-style access the game handlers use."""
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown {type(self).__name__} fields: {', '.join(fields)}")
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return getattr(self, name, None) is not None
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def items(self):
+        return ((name, getattr(self, name)) for name in self.__slots__)
+
+    def to_dict(self):
+        # Unset optional fields are left off the wire
+        return {name: value for name, value in self.items() if value is not None}
+
+
+class Ingredient(Record):
+    __slots__ = ("id", "type", "prepared_by", "prepared_at")
+
+
+class Order(Record):
+    __slots__ = ("id", "type", "ingredients", "arrival_time")
+
+
+class Pizza(Record):
+    # "look" is a PIZZA_LOOKS code; the client maps it to emoji markup
+    __slots__ = ("pizza_id", "team", "built_at", "baking_time", "ingredients", "build_start_time",
+                 "status", "type", "order_id", "look", "oven_start", "completed_at")
+
+
+class Player(Record):
+    __slots__ = ("builder_ingredients",)
+
+
+class GameState(Record):
+    __slots__ = ("players", "prepared_ingredients", "built_pizzas", "oven", "completed_pizzas", "wasted_pizzas",
+                 "round", "max_rounds", "current_phase", "max_pizzas_in_oven", "round_duration", "oven_on",
+                 "oven_timer_start", "round_start_time", "debrief_duration", "debrief_start_time",
+                 "customer_orders", "pending_orders", "last_updated", "lead_times", "password")
+
+
+# Pizza presentation codes, keyed by round-3 order type where one applies
+PIZZA_LOOKS = {
+    "ham": "ham",
+    "pineapple": "pineapple",
+    "ham & pineapple": "ham_pineapple",
+    "light ham": "ham",
+    "light pineapple": "pineapple",
+    "plain": "plain",
+    "heavy ham": "ham",
+    "heavy pineapple": "pineapple",
+}
+LOOK_INVALID = "invalid"
+LOOK_UNMATCHED = "unmatched"
+
+
+class IdIndex:
+    """Insertion-ordered items keyed by their id field, sent to clients as a plain list."""
+    __slots__ = ("key", "items")
+
+    def __init__(self, key, items=()):
+        self.key = key
+        self.items = {}
+        self.extend(items)
+
+    def __iter__(self):
+        return iter(self.items.values())
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item_id):
+        return item_id in self.items
+
+    def get(self, item_id):
+        return self.items.get(item_id)
+
+    def append(self, item):
+        self.items[item[self.key]] = item
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def pop(self, item_id, default=None):
+        return self.items.pop(item_id, default)
+
+    def remove(self, item):
+        self.pop(item[self.key])
+
+    def clear(self):
+        self.items.clear()
+
+    def to_list(self):
+        return list(self.items.values())
+
+
+MAX_LEAD_TIME_SAMPLES = 1000  # Raw samples kept per round; stats keep counting past this
+LEAD_TIME_BUCKET = 10  # Histogram bucket width (seconds)
+LEAD_TIME_BUCKETS = 30  # The last bucket also holds everything slower
+
+
+class LeadTimes:
+    """One round's pizza lead times in flat arrays, with running summary statistics."""
+    __slots__ = ("pizza_ids", "lead", "start", "completed", "sorted_lead",
+                 "count", "completed_count", "total", "low", "high", "histogram")
+
+    def __init__(self):
+        self.pizza_ids = []
+        self.lead = array("d")
+        self.start = array("d")
+        self.completed = array("b")
+        self.sorted_lead = array("d")
+        self.count = 0
+        self.completed_count = 0
+        self.total = 0.0
+        self.low = None
+        self.high = None
+        self.histogram = array("l", [0] * LEAD_TIME_BUCKETS)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, pizza_id, lead_time, start_time, status):
+        self.count += 1
+        self.total += lead_time
+        if status == "completed":
+            self.completed_count += 1
+        self.low = lead_time if self.low is None else min(self.low, lead_time)
+        self.high = lead_time if self.high is None else max(self.high, lead_time)
+        self.histogram[min(int(lead_time // LEAD_TIME_BUCKET), LEAD_TIME_BUCKETS - 1)] += 1
+        if len(self.lead) < MAX_LEAD_TIME_SAMPLES:
+            self.pizza_ids.append(pizza_id)
+            self.lead.append(lead_time)
+            self.start.append(start_time)
+            self.completed.append(status == "completed")
+            insort(self.sorted_lead, lead_time)
+
+    def percentile(self, q):
+        if not self.sorted_lead:
+            return None
+        # Nearest-rank over the retained samples
+        rank = max(0, min(len(self.sorted_lead) - 1, int(round(q / 100 * len(self.sorted_lead))) - 1))
+        return self.sorted_lead[rank]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "completed": self.completed_count,
+            "incomplete": self.count - self.completed_count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.low,
+            "max": self.high,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "bucket_size": LEAD_TIME_BUCKET,
+            "histogram": self.histogram.tolist()
+        }
+
+    def dump(self):
+        # Everything needed to rebuild this object, for the room log
+        return {
+            "pizza_ids": self.pizza_ids,
+            "lead": self.lead.tolist(),
+            "start": self.start.tolist(),
+            "completed": self.completed.tolist(),
+            "count": self.count,
+            "completed_count": self.completed_count,
+            "total": self.total,
+            "low": self.low,
+            "high": self.high,
+            "histogram": self.histogram.tolist()
+        }
+
+    @classmethod
+    def load(cls, data):
+        lead_times = cls()
+        lead_times.pizza_ids = list(data["pizza_ids"])
+        lead_times.lead = array("d", data["lead"])
+        lead_times.start = array("d", data["start"])
+        lead_times.completed = array("b", data["completed"])
+        lead_times.sorted_lead = array("d", sorted(data["lead"]))
+        lead_times.count = data["count"]
+        lead_times.completed_count = data["completed_count"]
+        lead_times.total = data["total"]
+        lead_times.low = data["low"]
+        lead_times.high = data["high"]
+        lead_times.histogram = array("l", data["histogram"])
+        return lead_times
+
+    def samples(self):
+        return [
+            {
+                "pizza_id": pizza_id,
+                "lead_time": lead_time,
+                "start_time": start_time,
+                "status": "completed" if completed else "incomplete"
+            }
+            for pizza_id, lead_time, start_time, completed in zip(self.pizza_ids, self.lead, self.start, self.completed)
+        ]
+
+
+def order_signature(ingredients):
+    return ingredients["base"], ingredients["sauce"], ingredients["ham"], ingredients["pineapple"]
+
+
+class OrderBook(IdIndex):
+    """Customer orders, also indexed by ingredient counts so a built pizza finds its order directly."""
+    __slots__ = ("by_signature",)
+
+    def __init__(self, items=()):
+        self.by_signature = {}
+        super().__init__("id", items)
+
+    def append(self, order):
+        super().append(order)
+        self.by_signature.setdefault(order_signature(order["ingredients"]), {})[order["id"]] = order
+
+    def pop(self, order_id, default=None):
+        order = super().pop(order_id, None)
+        if order is None:
+            return default
+        signature = order_signature(order["ingredients"])
+        bucket = self.by_signature[signature]
+        del bucket[order_id]
+        if not bucket:
+            del self.by_signature[signature]
+        return order
+
+    def clear(self):
+        super().clear()
+        self.by_signature.clear()
+
+    def match(self, counts):
+        # Oldest open order with exactly these ingredient counts
+        bucket = self.by_signature.get(order_signature(counts))
+        return next(iter(bucket.values())) if bucket else None
+
+
+def new_game_state(password=None, round_duration=180, debrief_duration=120):
+    return GameState(
+        players={},
+        prepared_ingredients=IdIndex("id"),
+        built_pizzas=IdIndex("pizza_id"),
+        oven=IdIndex("pizza_id"),
+        completed_pizzas=IdIndex("pizza_id"),
+        wasted_pizzas=IdIndex("pizza_id"),
+        round=1,
+        max_rounds=3,
+        current_phase="waiting",
+        max_pizzas_in_oven=3,
+        round_duration=round_duration,
+        oven_on=False,
+        debrief_duration=debrief_duration,
+        customer_orders=OrderBook(),
+        pending_orders=IdIndex("id"),
+        last_updated=time.time(),
+        lead_times=LeadTimes(),
+        password=password
+    )
+
+
+def to_wire(value):
+    """The single serializer from room state to JSON-ready values."""
+    if isinstance(value, LeadTimes):
+        # Only the summary travels with room state; raw samples go out once at round end
+        return value.summary()
+    if isinstance(value, Record):
+        return {name: to_wire(field) for name, field in value.to_dict().items()}
+    if isinstance(value, IdIndex):
+        return [to_wire(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_wire(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_wire(item) for item in value]
+    return value
+
+
+def to_log(value):
+    """Like to_wire, but keeps the full lead-time data so logged state can be rebuilt exactly."""
+    if isinstance(value, LeadTimes):
+        return {"$lead_times": value.dump()}
+    if isinstance(value, Record):
+        return {name: to_log(field) for name, field in value.to_dict().items()}
+    if isinstance(value, IdIndex):
+        return [to_log(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_log(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_log(item) for item in value]
+    return value
+
+
+# Record type of the items in each id-indexed collection of a room
+COLLECTION_RECORDS = {
+    "prepared_ingredients": Ingredient,
+    "built_pizzas": Pizza,
+    "oven": Pizza,
+    "completed_pizzas": Pizza,
+    "wasted_pizzas": Pizza,
+    "customer_orders": Order,
+    "pending_orders": Order,
+}
+
+
+def game_state_from_log(data):
+    """Rebuilds a GameState from its to_log form."""
+    game_state = new_game_state()
+    for name, value in data.items():
+        if name == "players":
+            value = {sid: Player(builder_ingredients=[Ingredient(**ing) for ing in player["builder_ingredients"]])
+                     for sid, player in value.items()}
+        elif name in COLLECTION_RECORDS:
+            game_state[name].extend(COLLECTION_RECORDS[name](**item) for item in value)
+            continue
+        elif name == "lead_times":
+            value = LeadTimes.load(value["$lead_times"])
+        elif name not in GameState.__slots__:
+            continue
+        game_state[name] = value
+    return game_state
+
+
+def to_columns(value):
+    """Compact wire form: lists of objects become a key row plus value rows.
+
+    Cells for keys an object lacks are sent as null and dropped again by the client,
+    which matches how records leave unset fields off the wire.
+    """
+    if isinstance(value, Snapshot):
+        return value.columns()
+    if isinstance(value, list):
+        if len(value) > 1 and all(isinstance(item, dict) for item in value):
+            columns = list(dict.fromkeys(key for item in value for key in item))
+            return {"$columns": columns,
+                    "$rows": [[to_columns(item.get(key)) for key in columns] for item in value]}
+        return [to_columns(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_columns(item) for key, item in value.items()}
+    return value
+
+
+class Snapshot:
+    """A room's full wire state at one version, JSON-encoded at most once per encoding."""
+    __slots__ = ("version", "payload", "encoded", "compact")
+
+    def __init__(self, version, payload):
+        self.version = version
+        self.payload = payload
+        self.encoded = None
+        self.compact = None
+
+    def to_json(self):
+        if self.encoded is None:
+            self.encoded = json.dumps(self.payload, separators=(",", ":"))
+        return self.encoded
+
+    def columns(self):
+        if self.compact is None:
+            self.compact = Snapshot(self.version, to_columns(self.payload))
+        return self.compact
+
+
+# Placeholder for a snapshot while the rest of a packet is encoded; the nonce keeps client strings from matching
+SPLICE_MARK = f"\u0000snapshot:{uuid.uuid4().hex}:%d\u0000"
+
+
+class WireJSON:
+    """JSON module for Socket.IO packets that splices in snapshots' cached encodings."""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        snapshots = []
+
+        def splice(value):
+            if not isinstance(value, Snapshot):
+                raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+            snapshots.append(value)
+            return SPLICE_MARK % (len(snapshots) - 1)
+
+        # ASCII-escaped so each mark's NULs are encoded exactly as json.dumps(SPLICE_MARK % i) below
+        text = json.dumps(obj, default=splice, **{**kwargs, "ensure_ascii": True})
+        for i, snapshot in enumerate(snapshots):
+            text = text.replace(json.dumps(SPLICE_MARK % i), snapshot.to_json(), 1)
+        return text
+
+    loads = staticmethod(json.loads)
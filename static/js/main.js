@@ -1,4 +1,5 @@
-    var socket = io({ transports: ['websocket', 'polling'], reconnection: true });
+    // "columns" asks the server for the compact encoding (see fromColumns); servers that don't know it send JSON
+    var socket = io({ transports: ['websocket', 'polling'], reconnection: true, auth: { encoding: "columns" } });
     var myRoom = localStorage.getItem('myRoom') || "";
     var isInitialConnect = true;
 
@@ -43,6 +44,7 @@ async function filterRoomName(event) {
 }
 
 socket.on('connect', function() {
+  socket.emit('time_request');
   if (isInitialConnect) {
     var roomModal = new bootstrap.Modal(document.getElementById('roomModal'), {
       backdrop: 'static',
@@ -93,6 +95,16 @@ socket.on('connect', function() {
       "heavy pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🍍</span></div>'
     };
 
+    // Server sends a short "look" code per pizza instead of markup
+    var pizzaLooks = {
+      "ham": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓</span></div>',
+      "pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🍍</span></div>',
+      "ham_pineapple": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🥓🍍</span></div>',
+      "plain": '<div class="emoji-wrapper"><span class="emoji">🍕</span></div>',
+      "invalid": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">🚫</span></div>',
+      "unmatched": '<div class="emoji-wrapper"><span class="emoji">🍕</span><span class="emoji">❓</span></div>'
+    };
+
     const debriefContent = {
       1: {
         question: "Reflect on the round: How did you identify and streamline your pizza-making process? Did the oven’s WIP limit of 3 pizzas affect your strategy?",
@@ -117,11 +129,72 @@ socket.on('connect', function() {
       document.getElementById("player-count-label").innerText = `${playerCount}`;
     }
 
+    // The server pushes one time_response per room per second; between ticks
+    // the countdowns are computed locally from the last known timestamps.
+    var clock = null;
+    var serverOffset = 0;
+
+    function renderClock() {
+      if (!clock) return;
+      var now = (Date.now() / 1000) + serverOffset;
+      var remaining = 0;
+      if (clock.phase === "round" && clock.round_start_time) {
+        remaining = Math.max(0, Math.floor(clock.round_duration - (now - clock.round_start_time)));
+      } else if (clock.phase === "debrief" && clock.debrief_start_time) {
+        remaining = Math.max(0, Math.floor(clock.debrief_duration - (now - clock.debrief_start_time)));
+      }
+      var ovenTime = clock.oven_timer_start ? Math.floor(now - clock.oven_timer_start) : 0;
+
+      if (clock.phase === "debrief") {
+        document.getElementById("timer").innerText = "DEBRIEF:\n" + remaining + " sec";
+      } else if (clock.phase === "round") {
+        document.getElementById("timer").innerText = "Round Time:\n" + remaining + " sec";
+      } else {
+        document.getElementById("timer").innerText = "Round Time:";
+      }
+      document.getElementById("oven-timer").innerText = "Oven Time:\n" + ovenTime + " sec";
+    }
+
+    function syncClockFromState(gameState) {
+      clock = {
+        phase: gameState.current_phase,
+        round_start_time: gameState.round_start_time,
+        round_duration: gameState.round_duration,
+        debrief_start_time: gameState.debrief_start_time,
+        debrief_duration: gameState.debrief_duration,
+        oven_timer_start: gameState.oven_on ? gameState.oven_timer_start : null
+      };
+      renderClock();
+    }
+
+    setInterval(renderClock, 250);
+
+    // Occasional resync also keeps this player marked as active on the server
     setInterval(() => {
       socket.emit('time_request');
-    }, 1000);
+    }, 30000);
+
+// Lobby view: a full room_list on subscribe, then room_list_update diffs
+var lobby = { rooms: {}, high_scores: {} };
 
 socket.on('room_list', function(data) {
+  lobby.rooms = data.rooms;
+  lobby.high_scores = data.high_scores;
+  renderLobby(lobby);
+});
+
+socket.on('room_list_update', function(update) {
+  Object.assign(lobby.rooms, update.added, update.changed);
+  update.removed.forEach(function(room) {
+    delete lobby.rooms[room];
+  });
+  if (update.high_scores) {
+    lobby.high_scores = update.high_scores;
+  }
+  renderLobby(lobby);
+});
+
+function renderLobby(data) {
   var tbody = document.getElementById('room-table-body');
   tbody.innerHTML = '';
 
@@ -193,7 +266,7 @@ socket.on('room_list', function(data) {
   table.appendChild(tbody);
 
   scoresDiv.appendChild(table);
-});
+}
 socket.on('join_error', function(data) {
   const roomInput = document.getElementById("room-input");
   const passwordInput = document.getElementById("password-input");
@@ -211,12 +284,96 @@ socket.on('join_error', function(data) {
 
     socket.on('game_state', function(newState) {
       updateGameState(newState);
+      if (newState.current_phase === "debrief" && analyticsRound !== newState.round) {
+        // Joined mid-debrief: the server keeps the round's analytics
+        socket.emit('request_round_analytics', {round: newState.round});
+      }
       var joinModal = bootstrap.Modal.getInstance(document.getElementById('roomModal'));
       if (joinModal) {
         joinModal.hide();
       }
     });
 
+    // Room broadcasts are coalesced server-side into [event, data] frames
+    socket.on('batch', function(frames) {
+      frames.forEach(function(frame) {
+        socket.listeners(frame[0]).forEach(function(handler) {
+          handler(frame[1]);
+        });
+      });
+    });
+
+    // Undo the server's columnar encoding: {$columns, $rows} back to a list of objects
+    function fromColumns(value) {
+      if (Array.isArray(value)) {
+        return value.map(fromColumns);
+      }
+      if (value && typeof value === "object") {
+        if (value.$columns) {
+          return value.$rows.map(function(row) {
+            var item = {};
+            value.$columns.forEach(function(key, i) {
+              if (row[i] !== null) item[key] = fromColumns(row[i]);
+            });
+            return item;
+          });
+        }
+        var decoded = {};
+        Object.keys(value).forEach(function(key) {
+          decoded[key] = fromColumns(value[key]);
+        });
+        return decoded;
+      }
+      return value;
+    }
+
+    socket.on('packed', function(frames) {
+      fromColumns(frames).forEach(function(frame) {
+        socket.listeners(frame[0]).forEach(function(handler) {
+          handler(frame[1]);
+        });
+      });
+    });
+
+    var itemKeys = {
+      prepared_ingredients: "id",
+      built_pizzas: "pizza_id",
+      oven: "pizza_id",
+      completed_pizzas: "pizza_id",
+      wasted_pizzas: "pizza_id",
+      customer_orders: "id",
+      pending_orders: "id"
+    };
+
+    socket.on('state_patch', function(patch) {
+      if (state.version === undefined || patch.base !== state.version) {
+        // Missed a patch (or joined mid-stream): ask for a full snapshot
+        socket.emit('request_full_state');
+        return;
+      }
+      Object.assign(state, patch.set || {});
+      Object.keys(patch.removed || {}).forEach(function(name) {
+        var gone = new Set(patch.removed[name]);
+        state[name] = state[name].filter(function(item) { return !gone.has(item[itemKeys[name]]); });
+      });
+      Object.keys(patch.added || {}).forEach(function(name) {
+        state[name] = state[name].concat(patch.added[name]);
+      });
+      Object.keys(patch.players || {}).forEach(function(sid) {
+        if (patch.players[sid] === null) {
+          delete state.players[sid];
+        } else {
+          state.players[sid] = patch.players[sid];
+        }
+      });
+      if (patch.lead_times) {
+        // Running summary for the current round; raw samples only arrive with round_ended
+        state.lead_times = patch.lead_times;
+      }
+      state.version = patch.version;
+      updateGameState(state);
+    });
+
     var modalEl = document.getElementById("modal");
     var modal = new bootstrap.Modal(modalEl);
     document.getElementById("instructions-btn").addEventListener("click", () => modal.show());
@@ -224,14 +381,17 @@ socket.on('join_error', function(data) {
     document.getElementById("modal-close").addEventListener("click", () => modal.hide());
 
     socket.on('time_response', function(data) {
-      if (data.phase === "debrief") {
-        document.getElementById("timer").innerText = "DEBRIEF:\n" + data.roundTimeRemaining + " sec";
-      } else if (data.phase === "round") {
-        document.getElementById("timer").innerText = "Round Time:\n" + data.roundTimeRemaining + " sec";
-      } else {
+      if (data.server_time) {
+        serverOffset = data.server_time - (Date.now() / 1000);
+      }
+      if (data.phase === undefined) {
+        clock = null;
         document.getElementById("timer").innerText = "Round Time:";
+        document.getElementById("oven-timer").innerText = "Oven Time:\n0 sec";
+        return;
       }
-      document.getElementById("oven-timer").innerText = "Oven Time:\n" + data.ovenTime + " sec";
+      clock = data;
+      renderClock();
     });
 
     function allowDrop(ev) { ev.preventDefault(); }
@@ -266,64 +426,103 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
       var ingredient_type = ev.dataTransfer.getData("ingredient_type");
       socket.emit('take_ingredient', { ingredient_id: ingredient_id, target_sid: sid });
     }
-    function updateBuilderDisplay() {
-      var builderDiv = document.getElementById("pizza-builder");
-      builderDiv.innerHTML = "";
-      builderIngredients.forEach(function(ing) {
-        var item = document.createElement("div");
-        item.classList.add("ingredient");
-        item.innerText = ingredientEmoji[ing.type] || ing.type;
-        builderDiv.appendChild(item);
+    // Keyed reconciliation: children carry data-key, nodes whose key survives are kept (and only
+    // refilled when signatureOf changes), the rest are created, moved or removed as needed
+    function reconcile(container, items, keyOf, signatureOf, fill) {
+      var existing = new Map();
+      Array.from(container.children).forEach(function(child) {
+        if (child.dataset.key !== undefined) existing.set(child.dataset.key, child);
+      });
+      var cursor = container.firstElementChild;
+      items.forEach(function(item) {
+        var key = String(keyOf(item));
+        var signature = signatureOf(item);
+        var node = existing.get(key);
+        if (node) {
+          existing.delete(key);
+        } else {
+          node = document.createElement("div");
+          node.dataset.key = key;
+        }
+        if (node.renderedSignature !== signature) {
+          fill(node, item);
+          node.renderedSignature = signature;
+        }
+        if (node === cursor) {
+          cursor = cursor.nextElementSibling;
+        } else {
+          container.insertBefore(node, cursor);
+        }
       });
+      existing.forEach(function(node) { node.remove(); });
+    }
+
+    function byId(item) { return item.id; }
+    function byPizzaId(pizza) { return pizza.pizza_id; }
+    function byType(item) { return item.type; }
+
+    function fillIngredient(div, ing) {
+      div.className = "ingredient";
+      div.innerText = ingredientEmoji[ing.type] || ing.type;
+    }
+
+    function updateBuilderDisplay() {
+      reconcile(document.getElementById("pizza-builder"), builderIngredients, byId, byType, fillIngredient);
     }
     function prepareIngredient(type) {
       socket.emit('prepare_ingredient', { ingredient_type: type });
     }
 
     function renderPizzaBuilders(players) {
-      var container = document.getElementById("pizza-builders-container");
-      container.innerHTML = "";
-      Object.keys(players).forEach(function(sid, index) {
-        var colDiv = document.createElement("div");
-        colDiv.classList.add("col-md-4");
-        var builderDiv = document.createElement("div");
-        builderDiv.classList.add("pizza-builder-container");
-        builderDiv.innerHTML = `<h5>Builder #${index + 1}</h5>`;
-        var ingredientsDiv = document.createElement("div");
-        ingredientsDiv.classList.add("d-flex", "flex-wrap", "pizza-builder-dropzone");
-        ingredientsDiv.setAttribute("ondrop", `dropToSharedBuilder(event, '${sid}')`);
-        ingredientsDiv.setAttribute("ondragover", "allowDrop(event)");
-        players[sid]["builder_ingredients"].forEach(function(ing) {
-          var item = document.createElement("div");
-          item.classList.add("ingredient");
-          item.innerText = ingredientEmoji[ing.type] || ing.type;
-          ingredientsDiv.appendChild(item);
-        });
-        builderDiv.appendChild(ingredientsDiv);
-        var submitBtn = document.createElement("button");
-        submitBtn.className = "btn btn-primary btn-custom mt-2";
-        submitBtn.innerText = "Submit Pizza";
-        submitBtn.onclick = function() {
-          socket.emit('build_pizza', { player_sid: sid });
-        };
-        builderDiv.appendChild(submitBtn);
-        colDiv.appendChild(builderDiv);
-        container.appendChild(colDiv);
-
-        if ('ontouchstart' in window) {
-          ingredientsDiv.addEventListener("touchend", function(ev) {
-            ev.preventDefault();
-            if (touchSelectedIngredient) {
-              socket.emit('take_ingredient', { ingredient_id: touchSelectedIngredient.id, target_sid: sid });
-              touchSelectedIngredient = null;
-              var selectedItems = document.querySelectorAll('.ingredient.selected');
-              selectedItems.forEach(function(el) {
-                el.classList.remove('selected');
-              });
-            }
-          });
-        }
+      var builders = Object.keys(players).map(function(sid, index) {
+        return { sid: sid, index: index, ingredients: players[sid]["builder_ingredients"] };
       });
+      reconcile(document.getElementById("pizza-builders-container"), builders,
+        function(builder) { return builder.sid; },
+        function(builder) { return builder.index + ":" + builder.ingredients.map(byId).join(","); },
+        fillPizzaBuilder);
+    }
+
+    function fillPizzaBuilder(colDiv, builder) {
+      if (!colDiv.firstChild) {
+        buildPizzaBuilder(colDiv, builder.sid);
+      }
+      colDiv.querySelector("h5").innerText = `Builder #${builder.index + 1}`;
+      reconcile(colDiv.querySelector(".pizza-builder-dropzone"), builder.ingredients, byId, byType, fillIngredient);
+    }
+
+    function buildPizzaBuilder(colDiv, sid) {
+      colDiv.classList.add("col-md-4");
+      var builderDiv = document.createElement("div");
+      builderDiv.classList.add("pizza-builder-container");
+      builderDiv.innerHTML = "<h5></h5>";
+      var ingredientsDiv = document.createElement("div");
+      ingredientsDiv.classList.add("d-flex", "flex-wrap", "pizza-builder-dropzone");
+      ingredientsDiv.setAttribute("ondrop", `dropToSharedBuilder(event, '${sid}')`);
+      ingredientsDiv.setAttribute("ondragover", "allowDrop(event)");
+      builderDiv.appendChild(ingredientsDiv);
+      var submitBtn = document.createElement("button");
+      submitBtn.className = "btn btn-primary btn-custom mt-2";
+      submitBtn.innerText = "Submit Pizza";
+      submitBtn.onclick = function() {
+        socket.emit('build_pizza', { player_sid: sid });
+      };
+      builderDiv.appendChild(submitBtn);
+      colDiv.appendChild(builderDiv);
+
+      if ('ontouchstart' in window) {
+        ingredientsDiv.addEventListener("touchend", function(ev) {
+          ev.preventDefault();
+          if (touchSelectedIngredient) {
+            socket.emit('take_ingredient', { ingredient_id: touchSelectedIngredient.id, target_sid: sid });
+            touchSelectedIngredient = null;
+            var selectedItems = document.querySelectorAll('.ingredient.selected');
+            selectedItems.forEach(function(el) {
+              el.classList.remove('selected');
+            });
+          }
+        });
+      }
     }
 
 
@@ -346,15 +545,24 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
     }
 
     var state = {};
+    var renderPending = false;
+
+    // Broadcasts arrive on every click by any player; state updates at once, the DOM once per frame
     function updateGameState(newState) {
       state = newState;
+      if (!renderPending) {
+        renderPending = true;
+        requestAnimationFrame(renderGameState);
+      }
+    }
+
+    function renderGameState() {
+      renderPending = false;
       console.log("Game State:", state);
+      syncClockFromState(state);
 
       const playerCount = Object.keys(state.players).length;
       updateRoomLabels(myRoom || "Unknown", playerCount);
-      if (state.lead_times) {
-            prepareChartData(state.lead_times);
-        }
       if (state.current_phase === "round") {
         document.getElementById("game-area").style.display = "block";
         document.getElementById("start-round").style.display = "none";
@@ -370,116 +578,100 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
       var orderCount = document.getElementById("order-count");
       if (state.round === 3 && state.current_phase === "round") {
         ordersDiv.style.display = "block";
-        ordersList.innerHTML = "";
-        state.customer_orders.forEach(function(order) {
-          var card = document.createElement("div");
-          card.classList.add("order-card");
-          card.setAttribute("data-order-id", order.id);
-
-          var idDiv = document.createElement("div");
-          idDiv.classList.add("order-id");
-          idDiv.innerText = `Order: ${order.id.slice(0, 6)}`;
-          card.appendChild(idDiv);
-
-          var ingredientsDiv = document.createElement("div");
-          ingredientsDiv.classList.add("order-ingredients");
-          var ingredientsText = [];
-          if (order.ingredients.base > 0) ingredientsText.push(`${ingredientEmoji["base"]}x${order.ingredients.base}`);
-          if (order.ingredients.sauce > 0) ingredientsText.push(`${ingredientEmoji["sauce"]}x${order.ingredients.sauce}`);
-          if (order.ingredients.ham > 0) ingredientsText.push(`${ingredientEmoji["ham"]}x${order.ingredients.ham}`);
-          if (order.ingredients.pineapple > 0) ingredientsText.push(`${ingredientEmoji["pineapple"]}x${order.ingredients.pineapple}`);
-          ingredientsDiv.innerText = ingredientsText.join(" ");
-          card.appendChild(ingredientsDiv);
-
-          var emojiDiv = document.createElement("div");
-          emojiDiv.classList.add("order-emoji");
-          emojiDiv.innerHTML = orderEmoji[order.type] || '<div class="emoji-wrapper"><span class="emoji">🍕</span></div>';
-          card.appendChild(emojiDiv);
-
-          ordersList.appendChild(card);
-        });
+        reconcile(ordersList, state.customer_orders, byId, byId, fillOrderCard);
         orderCount.innerText = state.customer_orders.length;
       } else {
         ordersDiv.style.display = "none";
         orderCount.innerText = "0";
       }
 
-      var poolDiv = document.getElementById("prepared-pool");
-      poolDiv.innerHTML = "";
-      state.prepared_ingredients.forEach(function(item) {
-        var div = document.createElement("div");
-        div.classList.add("ingredient");
-        div.setAttribute("draggable", "true");
-        div.setAttribute("data-id", item.id);
-        div.dataset.type = item.type;
-        div.innerText = ingredientEmoji[item.type] || item.type;
-        div.addEventListener("dragstart", drag);
-        if ('ontouchstart' in window) {
-          div.addEventListener("touchstart", function(ev) {
-            ev.preventDefault();
-            var previouslySelected = document.querySelectorAll('.ingredient.selected');
-            previouslySelected.forEach(function(el) {
-              el.classList.remove('selected');
-            });
-            touchSelectedIngredient = { id: item.id, type: item.type };
-            div.classList.add("selected");
-          });
-        }
-        poolDiv.appendChild(div);
-      });
+      reconcile(document.getElementById("prepared-pool"), state.prepared_ingredients, byId, byType, fillPreparedIngredient);
+      reconcile(document.getElementById("built-pizzas"), state.built_pizzas, byPizzaId, pizzaSignature, fillBuiltPizza);
+      reconcile(document.getElementById("oven"), state.oven, byPizzaId, pizzaSignature, fillLabelledPizza);
+      reconcile(document.getElementById("completed"), state.completed_pizzas, byPizzaId, pizzaSignature, fillLabelledPizza);
+      reconcile(document.getElementById("wasted"), state.wasted_pizzas, byPizzaId, pizzaSignature, fillPizza);
+    }
 
-      function renderPizza(pizza, extraLabel) {
-        var div = document.createElement("div");
-        if (pizza.emoji) {
-          div.innerHTML = pizza.emoji;
-        } else {
-          div.innerText = "Pizza " + pizza.pizza_id;
-        }
-        if (extraLabel) {
-          var label = document.createElement("span");
-          label.innerText = extraLabel;
-          div.appendChild(label);
-        }
-        if (pizza.status) {
-          div.classList.add(pizza.status);
-        }
-        return div;
+    function fillOrderCard(card, order) {
+      card.classList.add("order-card");
+      card.setAttribute("data-order-id", order.id);
+
+      var idDiv = document.createElement("div");
+      idDiv.classList.add("order-id");
+      idDiv.innerText = `Order: ${order.id.slice(0, 6)}`;
+      card.appendChild(idDiv);
+
+      var ingredientsDiv = document.createElement("div");
+      ingredientsDiv.classList.add("order-ingredients");
+      var ingredientsText = [];
+      if (order.ingredients.base > 0) ingredientsText.push(`${ingredientEmoji["base"]}x${order.ingredients.base}`);
+      if (order.ingredients.sauce > 0) ingredientsText.push(`${ingredientEmoji["sauce"]}x${order.ingredients.sauce}`);
+      if (order.ingredients.ham > 0) ingredientsText.push(`${ingredientEmoji["ham"]}x${order.ingredients.ham}`);
+      if (order.ingredients.pineapple > 0) ingredientsText.push(`${ingredientEmoji["pineapple"]}x${order.ingredients.pineapple}`);
+      ingredientsDiv.innerText = ingredientsText.join(" ");
+      card.appendChild(ingredientsDiv);
+
+      var emojiDiv = document.createElement("div");
+      emojiDiv.classList.add("order-emoji");
+      emojiDiv.innerHTML = orderEmoji[order.type] || '<div class="emoji-wrapper"><span class="emoji">🍕</span></div>';
+      card.appendChild(emojiDiv);
+    }
+
+    function fillPreparedIngredient(div, item) {
+      div.classList.add("ingredient");
+      div.setAttribute("draggable", "true");
+      div.setAttribute("data-id", item.id);
+      div.dataset.type = item.type;
+      div.innerText = ingredientEmoji[item.type] || item.type;
+      div.addEventListener("dragstart", drag);
+      if ('ontouchstart' in window) {
+        div.addEventListener("touchstart", function(ev) {
+          ev.preventDefault();
+          var previouslySelected = document.querySelectorAll('.ingredient.selected');
+          previouslySelected.forEach(function(el) {
+            el.classList.remove('selected');
+          });
+          touchSelectedIngredient = { id: item.id, type: item.type };
+          div.classList.add("selected");
+        });
       }
+    }
 
-      var builtDiv = document.getElementById("built-pizzas");
-      builtDiv.innerHTML = "";
-      state.built_pizzas.forEach(function(pizza) {
-        var div = renderPizza(pizza, "");
-        var btn = document.createElement("button");
-        btn.className = "btn btn-sm btn-outline-primary ms-2";
-        btn.innerText = "Move to Oven";
-        btn.onclick = function() {
-          socket.emit('move_to_oven', { pizza_id: pizza.pizza_id });
-        };
-        div.appendChild(btn);
-        builtDiv.appendChild(div);
-      });
+    // A pizza's node is refilled only when how it looks changes (e.g. its status in the oven)
+    function pizzaSignature(pizza) {
+      return (pizza.look || "") + "|" + (pizza.status || "");
+    }
 
-      var ovenDiv = document.getElementById("oven");
-      ovenDiv.innerHTML = "";
-      state.oven.forEach(function(pizza) {
-        var div = renderPizza(pizza, " ");
-        ovenDiv.appendChild(div);
-      });
+    function fillPizza(div, pizza, extraLabel) {
+      div.className = "";
+      if (pizzaLooks[pizza.look]) {
+        div.innerHTML = pizzaLooks[pizza.look];
+      } else {
+        div.innerText = "Pizza " + pizza.pizza_id;
+      }
+      if (extraLabel) {
+        var label = document.createElement("span");
+        label.innerText = extraLabel;
+        div.appendChild(label);
+      }
+      if (pizza.status) {
+        div.classList.add(pizza.status);
+      }
+    }
 
-      var compDiv = document.getElementById("completed");
-      compDiv.innerHTML = "";
-      state.completed_pizzas.forEach(function(pizza) {
-        var div = renderPizza(pizza, " ");
-        compDiv.appendChild(div);
-      });
+    function fillLabelledPizza(div, pizza) {
+      fillPizza(div, pizza, " ");
+    }
 
-      var wastedDiv = document.getElementById("wasted");
-      wastedDiv.innerHTML = "";
-      state.wasted_pizzas.forEach(function(pizza) {
-        var div = renderPizza(pizza, "");
-        wastedDiv.appendChild(div);
-      });
+    function fillBuiltPizza(div, pizza) {
+      fillPizza(div, pizza, "");
+      var btn = document.createElement("button");
+      btn.className = "btn btn-sm btn-outline-primary ms-2";
+      btn.innerText = "Move to Oven";
+      btn.onclick = function() {
+        socket.emit('move_to_oven', { pizza_id: pizza.pizza_id });
+      };
+      div.appendChild(btn);
     }
 
     function updateVisibility() {
@@ -516,7 +708,6 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
     socket.on('round_started', function(data) {
       state.round = data.round;
       state.current_phase = "round";
-      state.customer_orders = data.customer_orders;
       updateMessage("Round " + data.round + " started. Duration: " + data.duration + " sec");
       document.getElementById("game-area").style.display = "block";
       document.getElementById("start-round").style.display = "none";
@@ -537,6 +728,9 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
       if (result.lead_times) {
         prepareChartData(result.lead_times);
         }
+      if (result.analytics) {
+        renderRoundAnalytics(result.analytics);
+      }
       if (state.round === 3) {
         document.getElementById("fulfilled-orders").style.display = "block";
         document.getElementById("remaining-orders").style.display = "block";
@@ -562,6 +756,12 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
       updateVisibility();
     });
 
+    socket.on('round_analytics', function(data) {
+      if (data.analytics) {
+        renderRoundAnalytics(data.analytics);
+      }
+    });
+
     socket.on('game_reset', function(state) {
       updateMessage("Round reset. Ready for a new round.");
       document.getElementById("timer").innerText = "Round Time:";
@@ -586,6 +786,9 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
     socket.on('oven_error', function(data) {
       updateMessage("Oven Error: " + data.message);
     });
+    socket.on('oven_warning', function(data) {
+      updateMessage("Oven: " + data.message);
+    });
     socket.on('pizza_moved_to_oven', function(pizza) {
       updateMessage("Pizza moved to oven: " + pizza.pizza_id);
     });
@@ -601,36 +804,9 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
     socket.on('clear_shared_builder', function(data) {
       renderPizzaBuilders(state.players);
     });
-    socket.on('new_order', function(order) {
-      updateMessage("New order received: " + order.type);
-      state.customer_orders.push(order);
-      var ordersList = document.getElementById("orders-list");
-      var card = document.createElement("div");
-      card.classList.add("order-card");
-      card.setAttribute("data-order-id", order.id);
-
-      var idDiv = document.createElement("div");
-      idDiv.classList.add("order-id");
-      idDiv.innerText = `Order: ${order.id.slice(0, 6)}`;
-      card.appendChild(idDiv);
-
-      var ingredientsDiv = document.createElement("div");
-      ingredientsDiv.classList.add("order-ingredients");
-      var ingredientsText = [];
-      if (order.ingredients.base > 0) ingredientsText.push(`${ingredientEmoji["base"]}x${order.ingredients.base}`);
-      if (order.ingredients.sauce > 0) ingredientsText.push(`${ingredientEmoji["sauce"]}x${order.ingredients.sauce}`);
-      if (order.ingredients.ham > 0) ingredientsText.push(`${ingredientEmoji["ham"]}x${order.ingredients.ham}`);
-      if (order.ingredients.pineapple > 0) ingredientsText.push(`${ingredientEmoji["pineapple"]}x${order.ingredients.pineapple}`);
-      ingredientsDiv.innerText = ingredientsText.join(" ");
-      card.appendChild(ingredientsDiv);
-
-      var emojiDiv = document.createElement("div");
-      emojiDiv.classList.add("order-emoji");
-      emojiDiv.innerHTML = orderEmoji[order.type] || '<div class="emoji-wrapper"><span class="emoji">🍕</span></div>';
-      card.appendChild(emojiDiv);
-
-      ordersList.appendChild(card);
-      document.getElementById("order-count").innerText = state.customer_orders.length;
+    socket.on('new_order', function(orders) {
+      // Orders falling due together arrive as one list; the cards come with the next state_patch
+      updateMessage("New order received: " + orders.map(function(order) { return order.type; }).join(", "));
     });
     socket.on('order_fulfilled', function(data) {
       updateMessage("Order fulfilled: " + data.order_id);
@@ -654,12 +830,6 @@ document.getElementById("submit-pizza").addEventListener("click", function() {
       socket.disconnect();
     });
 
-    socket.on('game_state_update', function(update) {
-      if (update.customer_orders) state.customer_orders = update.customer_orders;
-      if (update.pending_orders) state.pending_orders = update.pending_orders;
-      updateGameState(state);
-    });
-
     socket.on('room_expired', function(data) {
       updateMessage(data.message);
       var roomModal = new bootstrap.Modal(document.getElementById('roomModal'), {
@@ -749,3 +919,55 @@ function renderLeadTimeChart(labels, completedData, incompleteData) {
         }
     });
 }
+
+
+let flowChart;
+let analyticsRound = null;
+
+function renderRoundAnalytics(analytics) {
+    analyticsRound = analytics.round;
+    const wip = analytics.wip.average;
+    const cycle = analytics.cycle_time.completed || analytics.cycle_time.all;
+    document.getElementById("debrief-wip").innerText =
+        `ingredients ${wip.prepared.toFixed(1)}, in builders ${wip.builders.toFixed(1)}, ` +
+        `built ${wip.built.toFixed(1)}, in oven ${wip.oven.toFixed(1)}`;
+    document.getElementById("debrief-cycle-time").innerText = cycle
+        ? `p50 ${cycle.p50.toFixed(1)}s, p85 ${cycle.p85.toFixed(1)}s, p95 ${cycle.p95.toFixed(1)}s`
+        : "no pizzas finished";
+    document.getElementById("debrief-throughput").innerText =
+        analytics.throughput.completed.join(" / ") + ` (per ${analytics.throughput.bucket_size}s)`;
+
+    const ctx = document.getElementById('flowChart').getContext('2d');
+    if (flowChart) {
+        flowChart.destroy();
+    }
+    // Cumulative flow: the gap between two bands is the work sitting between those stages
+    const band = (label, data, colour) => ({
+        label: label,
+        data: data,
+        borderColor: `rgba(${colour}, 1)`,
+        backgroundColor: `rgba(${colour}, 0.3)`,
+        fill: true,
+        pointRadius: 0
+    });
+    flowChart = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: analytics.cfd.t.map(t => `${Math.round(t)}s`),
+            datasets: [
+                band('Built', analytics.cfd.built, '255, 159, 64'),
+                band('Baked', analytics.cfd.baked, '255, 99, 132'),
+                band('Done', analytics.cfd.done, '75, 192, 75')
+            ]
+        },
+        options: {
+            scales: {
+                y: {beginAtZero: true, title: {display: true, text: 'Pizzas'}},
+                x: {title: {display: true, text: 'Round Time'}}
+            },
+            plugins: {
+                title: {display: true, text: 'Cumulative Flow'}
+            }
+        }
+    });
+}
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repo, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    # main logs to ROOM_LOG from import on; point it at a fresh file
+    os.environ["ROOM_LOG"] = str(tmp_path_factory.mktemp("room_log") / "room_log.db")
+    os.environ.setdefault("ASYNC_MODE", "eventlet")
+    return pytest.importorskip("main")
@@ -0,0 +1,46 @@
+from room_log import apply_patch
+
+
+def test_orders_due_at_round_start_arrive_once(main):
+    room = "orders"
+    client = main.socketio.test_client(main.app)
+    client.emit("join", {"room": room, "password": "pw"})
+    main.flush_broadcasts(room)
+    client.emit("request_full_state")
+    state = [m for m in client.get_received() if m["name"] == "game_state"][-1]["args"][0]
+    main.group_games[room]["round"] = 3
+
+    client.emit("start_round", {})
+    main.deliver_orders(room)  # The first order is due at 0 s, before the broadcast window closes
+    main.flush_broadcasts(room)
+
+    # Apply the frames the way the client does
+    for message in client.get_received():
+        frames = message["args"][0] if message["name"] == "batch" else [[message["name"], message["args"][0]]]
+        for event, data in frames:
+            if event == "round_started":
+                assert "customer_orders" not in data
+            elif event == "state_patch":
+                apply_patch(state, data, main.SYNCED_COLLECTIONS)
+    live = main.group_games[room]["customer_orders"]
+    assert len(live) >= 1
+    assert [order["id"] for order in state["customer_orders"]] == [order["id"] for order in live]
+    client.disconnect()
+
+
+def test_queued_frames_keep_the_data_as_queued(main):
+    room = "queued"
+    client = main.socketio.test_client(main.app)
+    client.emit("join", {"room": room, "password": "pw"})
+    main.flush_broadcasts(room)
+    client.get_received()
+    game_state = main.group_games[room]
+    client.emit("start_round", {})
+    client.emit("prepare_ingredient", {"ingredient_type": "base"})
+    prepared = next(iter(game_state["prepared_ingredients"]))
+    as_queued = prepared.to_dict()
+    prepared["type"] = "sauce"  # Changed before the broadcast window closes
+    main.flush_broadcasts(room)
+    frames = [f for m in client.get_received() if m["name"] == "batch" for f in m["args"][0]]
+    assert ["ingredient_prepared", as_queued] in frames
+    client.disconnect()
@@ -0,0 +1,22 @@
+import pytest
+from sqlalchemy.dialects import sqlite
+
+
+def query_plan(main, query):
+    sql = str(query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with main.db.engine.connect() as connection:
+        return " ".join(row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+
+
+@pytest.mark.parametrize("name, build", [
+    ("round", lambda R: R.query.filter_by(round_number=1).order_by(R.score.desc(), R.id).limit(3)),
+    ("room", lambda R: R.query.filter_by(room_name="r").order_by(R.timestamp.desc(), R.id.desc())
+     .limit(20).offset(20)),
+])
+def test_leaderboards_are_read_off_an_index_without_a_sort(main, name, build):
+    with main.app.app_context():
+        if main.db.engine.dialect.name != "sqlite":
+            pytest.skip("query plans checked on SQLite")
+        plan = query_plan(main, build(main.RoundResult))
+    assert "USING INDEX ix_round_results_" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,60 @@
+import fakeredis
+import pytest
+
+from room_store import RedisRoomStore
+
+
+@pytest.fixture
+def shared_store(main, monkeypatch):
+    # This worker and a second one ("other") sharing a fakeredis room directory
+    server = fakeredis.FakeServer()
+    store = RedisRoomStore(fakeredis.FakeRedis(server=server))
+    other = RedisRoomStore(fakeredis.FakeRedis(server=server))
+    store.heartbeat(main.WORKER_ID, 30)
+    other.heartbeat("other", 30)
+    monkeypatch.setattr(main, "room_store", store)
+    monkeypatch.setitem(main.lobby_snapshot, "rooms", {})
+    return other
+
+
+def lobby_client(main):
+    client = main.socketio.test_client(main.app)
+    client.emit("request_room_list")
+    client.get_received()
+    return client
+
+
+def room_list_updates(client):
+    return [(m["name"], m["args"][0]) for m in client.get_received() if m["name"].startswith("room_list")]
+
+
+def test_single_worker_lobby_gets_diffs(main):
+    main.update_room_list()  # Settle the baseline (high scores start unsent)
+    client = lobby_client(main)
+    main.update_room_list()
+    assert room_list_updates(client) == []
+    player = main.socketio.test_client(main.app)
+    player.emit("join", {"room": "diffed", "password": "pw"})
+    main.update_room_list()
+    [(name, update)] = room_list_updates(client)
+    assert name == "room_list_update" and update["added"] == {"diffed": 1}
+    player.disconnect()
+    main.update_room_list()
+    assert room_list_updates(client)[-1][1]["removed"] == ["diffed"]
+    client.disconnect()
+
+
+def test_multi_worker_lobby_gets_full_lists(main, shared_store):
+    client = lobby_client(main)
+    shared_store.claim("elsewhere", "other")
+    shared_store.update("elsewhere", 2)
+    main.update_room_list()
+    name, update = room_list_updates(client)[-1]
+    assert name == "room_list" and update["rooms"] == {"elsewhere": 2} and "high_scores" in update
+
+    # The other worker dies: its lease runs out and its rooms drop out of the directory
+    shared_store.client.delete(shared_store.worker_key + "other")
+    assert main.lobby_rooms() != main.lobby_snapshot["rooms"]  # What the heartbeat checks
+    main.update_room_list()
+    assert room_list_updates(client)[-1][1]["rooms"] == {}
+    client.disconnect()
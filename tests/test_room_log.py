@@ -0,0 +1,125 @@
+import sqlite3
+import threading
+
+from room_log import RoomLog, replay_frames
+from state import game_state_from_log, to_log
+
+
+class Team:
+    """One player in a room of their own, with every change flushed and written to the log."""
+
+    def __init__(self, main, room):
+        self.main = main
+        self.room = room
+        self.client = main.socketio.test_client(main.app)
+        self.play(("join", {"room": room, "password": "pw"}))
+
+    @property
+    def state(self):
+        return self.main.group_games[self.room]
+
+    def play(self, *events):
+        for event, data in events:
+            self.client.emit(event, data)
+            self.main.flush_broadcasts(self.room)
+        self.main.room_log.write(self.main.room_log.take_pending())
+
+    def take(self, count):
+        for ingredient in self.state["prepared_ingredients"].to_list()[:count]:
+            self.play(("take_ingredient", {"ingredient_id": ingredient["id"]}))
+
+    def play_round(self):
+        # One pizza through the oven, one invalid build, and an ingredient left in the builder
+        self.play(("start_round", {}))
+        self.play(*[("prepare_ingredient", {"ingredient_type": t})
+                    for t in ("base", "sauce", "ham", "ham", "ham", "ham", "base", "sauce")])
+        self.take(6)
+        self.play(("build_pizza", {}))
+        pizza = self.state["built_pizzas"].to_list()[0]
+        self.play(("move_to_oven", {"pizza_id": pizza["pizza_id"]}),
+                  ("toggle_oven", {"state": "on"}), ("toggle_oven", {"state": "off"}))
+        self.take(1)
+        self.play(("build_pizza", {}))
+        self.take(1)
+
+    def logged_kinds(self):
+        db = sqlite3.connect(self.main.room_log.path)
+        try:
+            return [kind for (kind,) in db.execute(
+                "SELECT kind FROM room_log WHERE room = ? ORDER BY seq", (self.room,))]
+        finally:
+            db.close()
+
+
+def test_recover_and_round_replay_reproduce_the_state(main):
+    team = Team(main, "replay")
+    team.play_round()
+    assert len(team.state["wasted_pizzas"]) == 2 and team.state["lead_times"].count == 2
+    assert [len(player["builder_ingredients"]) for player in team.state["players"].values()] == [1]
+    expected = to_log(team.state)
+
+    reopened = RoomLog(main.room_log.path)
+    recovered = reopened.recover(team.room, main.SYNCED_COLLECTIONS)
+    assert recovered["version"] == main.room_sync[team.room]["version"]
+    assert to_log(game_state_from_log(recovered)) == expected
+
+    snapshot, entries = reopened.round_log(team.room)
+    assert entries
+    state = snapshot["state"]
+    for _ in replay_frames(state, entries, main.SYNCED_COLLECTIONS):
+        pass
+    assert to_log(game_state_from_log(state)) == expected
+
+
+def test_round_snapshot_prunes_earlier_rounds(main):
+    team = Team(main, "pruned")
+    team.play_round()
+    main.end_round(team.room)
+    main.reset_round(team.room)
+    team.play()
+    first_round = team.logged_kinds()
+    assert first_round[0] == "round_snapshot" and "snapshot" in first_round  # Round end snapshots too
+
+    team.play_round()
+    second_round = team.logged_kinds()
+    assert second_round[0] == "round_snapshot" and second_round.count("round_snapshot") == 1
+    assert "snapshot" not in second_round
+    snapshot, _ = RoomLog(main.room_log.path).round_log(team.room)
+    assert snapshot["state"]["round"] == team.state["round"] == 2
+
+
+def test_recover_rooms_rebuilds_a_room_after_a_restart(main):
+    team = Team(main, "restarted")
+    team.play_round()
+    before = to_log(team.state)
+    version = main.room_sync[team.room]["version"]
+
+    # The restart: this process forgets the room, and a new one reads it back from the log
+    main.cancel_room_timers(team.room)
+    for rooms in (main.group_games, main.room_sync, main.round_timelines):
+        rooms.pop(team.room)
+    main.room_log = RoomLog(main.room_log.path)
+    main.recover_rooms()
+
+    after = to_log(team.state)
+    assert main.room_sync[team.room]["version"] == version
+    assert after.pop("players") == {}
+    builders = [ing for player in before.pop("players").values() for ing in player["builder_ingredients"]]
+    assert after.pop("prepared_ingredients") == before.pop("prepared_ingredients") + builders
+    assert after == before
+    assert {t["name"] for t in main.timer_wheel.pending(team.room)} >= {"round_end", "recovery_grace"}
+    assert team.room in main.round_timelines
+
+
+def test_writes_are_serialized(tmp_path):
+    log = RoomLog(str(tmp_path / "room_log.db"))
+    log.snapshot("r", {"round": 1}, 0, round_start=True)
+    done = threading.Event()
+    with log.write_lock:  # A batch in flight on another thread
+        writer = threading.Thread(target=lambda: (log.write(log.take_pending()), done.set()))
+        writer.start()
+        assert not done.wait(0.2)
+    assert done.wait(2)
+    writer.join()
+    snapshot, entries = log.round_log("r")
+    assert snapshot["state"] == {"round": 1, "version": 0} and entries == []
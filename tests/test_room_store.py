@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from room_store import RedisRoomStore
+
+TTL = 30
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def store(server):
+    return RedisRoomStore(fakeredis.FakeRedis(server=server))
+
+
+def test_claim_keeps_a_live_owner(server):
+    x, y = store(server), store(server)
+    x.heartbeat("X", TTL)
+    y.heartbeat("Y", TTL)
+    assert x.claim("pizza", "X")
+    assert x.claim("pizza", "X")
+    assert not y.claim("pizza", "Y")
+    assert y.owner("pizza") == "X"
+
+
+def test_dead_owner_room_is_taken_over_once(server):
+    dead, x, y = store(server), store(server), store(server)
+    assert dead.claim("pizza", "D")  # D never heartbeats
+    x.heartbeat("X", TTL)
+    y.heartbeat("Y", TTL)
+    assert x.owner("pizza") is None
+    assert x.claim("pizza", "X")
+    assert not y.claim("pizza", "Y")
+    assert y.owner("pizza") == "X"
+
+
+def test_concurrent_takeover_has_one_winner(server):
+    dead, x, y = store(server), store(server), store(server)
+    dead.claim("pizza", "D")
+    x.heartbeat("X", TTL)
+    y.heartbeat("Y", TTL)
+    alive = x.alive
+    raced = []
+
+    def alive_while_y_claims(worker_id):
+        # Y takes the room over between X reading the entry and X writing its own
+        if not raced:
+            raced.append(y.claim("pizza", "Y"))
+        return alive(worker_id)
+
+    x.alive = alive_while_y_claims
+    assert raced == [] and not x.claim("pizza", "X")
+    assert raced == [True]
+    assert x.owner("pizza") == "Y"
+
+
+def test_released_room_can_be_claimed_again(server):
+    x, y = store(server), store(server)
+    x.heartbeat("X", TTL)
+    y.heartbeat("Y", TTL)
+    x.claim("pizza", "X")
+    x.update("pizza", 3)
+    assert y.room_counts() == {"pizza": 3}
+    x.release("pizza")
+    assert y.claim("pizza", "Y")
+    assert x.room_counts() == {"pizza": 0}
+
+
+def test_room_counts_skip_dead_owners(server):
+    dead, x = store(server), store(server)
+    x.heartbeat("X", TTL)
+    dead.claim("gone", "D")
+    x.claim("pizza", "X")
+    assert x.room_counts() == {"pizza": 0}
+    assert x.room_count() == 1
+
+
+def test_forward_reaches_the_owner_listener(server):
+    owner, other = store(server), store(server)
+    received = queue.Queue()
+    threading.Thread(target=owner.listen, args=("X", received.put), daemon=True).start()
+    channel = other.forward_channel + "X"
+    for _ in range(100):
+        # The subscription is made on the listener thread
+        if other.client.pubsub_numsub(channel)[0][1]:
+            break
+        time.sleep(0.01)
+    message = {"event": "prepare_ingredient", "sid": "abc", "args": [{"ingredient_type": "base"}]}
+    other.forward("X", message)
+    assert received.get(timeout=1) == message
+    other.forward("Y", {"event": "elsewhere"})
+    with pytest.raises(queue.Empty):
+        received.get(timeout=0.2)
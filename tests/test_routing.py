@@ -0,0 +1,36 @@
+class ElsewhereStore:
+    """A room directory in which every room is owned by another worker."""
+
+    def __init__(self):
+        self.forwarded = []
+
+    def owner(self, room):
+        return "other"
+
+    def forward(self, worker_id, message):
+        self.forwarded.append(message)
+
+
+def test_forwarded_join_carries_the_columnar_encoding(main, monkeypatch):
+    compact = main.socketio.test_client(main.app, auth={"encoding": main.WIRE_COLUMNS})
+    plain = main.socketio.test_client(main.app)
+    store = ElsewhereStore()
+    with monkeypatch.context() as patched:
+        patched.setattr(main, "room_store", store)
+        compact.emit("join", {"room": "routed", "password": "pw"})
+        plain.emit("join", {"room": "routed", "password": "pw"})
+    join, plain_join = store.forwarded
+    assert join["encoding"] == main.WIRE_COLUMNS and "encoding" not in plain_join
+
+    # On the owner, which has never seen either client connect
+    main.compact_clients.discard(join["sid"])
+    for message, client in ((join, compact), (plain_join, plain)):
+        main.player_group.pop(message["sid"], None)
+        client.get_received()
+    main.handle_forwarded_event(join)
+    main.handle_forwarded_event(plain_join)
+    assert join["sid"] in main.compact_clients and plain_join["sid"] not in main.compact_clients
+    assert {m["name"] for m in compact.get_received()} == {"packed"}
+    assert "game_state" in [m["name"] for m in plain.get_received()]
+    compact.disconnect()
+    plain.disconnect()
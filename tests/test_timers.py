@@ -0,0 +1,153 @@
+import random
+
+import pytest
+
+import timers
+from timers import TimerWheel
+
+START = 1000.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = START
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(timers.time, "time", clock.time)
+    return clock
+
+
+def small_wheel():
+    # 4 one-second slots per level: level 0 spans 4 s, level 1 spans 16 s, the rest overflows
+    return TimerWheel(tick=1, slots=4, levels=2)
+
+
+def run_until(wheel, clock, end, step=0.5):
+    while clock.now < START + end:
+        clock.now += step
+        wheel._catch_up()
+
+
+def recorder(clock, fired):
+    def fire(label):
+        fired[label] = clock.now - START
+    return fire
+
+
+@pytest.mark.parametrize("delay", [0.5, 1, 3, 3.5, 4, 5, 7.9, 15, 16, 16.5, 17, 31, 40, 70])
+def test_fires_within_a_tick_of_due(clock, delay):
+    wheel = small_wheel()
+    fired = {}
+    wheel.schedule(delay, recorder(clock, fired), "t")
+    run_until(wheel, clock, 80)
+    assert delay <= fired["t"] < delay + wheel.tick
+
+
+def test_delays_across_level_boundaries(clock):
+    wheel = small_wheel()
+    fired = {}
+    fire = recorder(clock, fired)
+    near, far = wheel.schedule(3, fire, "near"), wheel.schedule(9, fire, "far")
+    assert near.slot in wheel.wheels[0]
+    assert far.slot in wheel.wheels[1]
+    run_until(wheel, clock, 8)
+    assert far.slot in wheel.wheels[0]  # Cascaded down when the wheel reached its bucket
+    run_until(wheel, clock, 12)
+    assert 3 <= fired["near"] < 4 and 9 <= fired["far"] < 10
+
+
+def test_overflow_bucket(clock):
+    wheel = small_wheel()
+    fired = {}
+    timer = wheel.schedule(40, recorder(clock, fired), "late")
+    assert timer.slot is wheel.overflow
+    run_until(wheel, clock, 17)
+    assert timer.slot is wheel.overflow
+    run_until(wheel, clock, 33)  # Overflow is cascaded once per full rotation of the top level
+    assert timer.slot in wheel.wheels[1]
+    run_until(wheel, clock, 45)
+    assert 40 <= fired["late"] < 41
+    assert not timer.active
+
+
+def test_cancel_after_cascade(clock):
+    wheel = small_wheel()
+    fired = {}
+    fire = recorder(clock, fired)
+    timer = wheel.schedule(10, fire, "cancelled")
+    wheel.schedule(11, fire, "kept", room="pizza")
+    run_until(wheel, clock, 8.5)
+    assert timer.slot in wheel.wheels[0]
+    timer.cancel()
+    assert not timer.active
+    assert [t["name"] for t in wheel.pending()] == ["fire"]
+    run_until(wheel, clock, 20)
+    assert "cancelled" not in fired and 11 <= fired["kept"] < 12
+    assert wheel.pending() == []
+
+
+def test_schedule_zero_coalesces_onto_the_next_tick(clock):
+    wheel = small_wheel()
+    calls = []
+    pending = []
+
+    def update():
+        calls.append(clock.now - START)
+
+    def schedule_update():
+        # As schedule_room_list_update: one update per tick however many changes ask for one
+        if not pending or not pending[-1].active:
+            pending.append(wheel.schedule(0, update))
+
+    clock.now += 0.2
+    for _ in range(5):
+        schedule_update()
+    assert len(pending) == 1 and pending[0].active
+    run_until(wheel, clock, 3, step=0.2)
+    assert len(calls) == 1 and 1 <= calls[0] < 1.2
+    schedule_update()
+    assert len(pending) == 2
+    run_until(wheel, clock, 6, step=0.2)
+    assert len(calls) == 2 and 4 <= calls[1] < 4.2
+
+
+def test_schedule_zero_from_a_callback_waits_for_the_next_tick(clock):
+    wheel = small_wheel()
+    calls = []
+
+    def again():
+        calls.append(clock.now - START)
+        if len(calls) < 3:
+            wheel.schedule(0, again)
+
+    wheel.schedule(0, again)
+    clock.now += 1
+    wheel._catch_up()
+    assert calls == [1]
+    run_until(wheel, clock, 5, step=1)
+    assert calls == [1, 2, 3]
+
+
+def test_random_delays_and_cancels(clock):
+    rng = random.Random(7)
+    wheel = small_wheel()
+    fired = {}
+    fire = recorder(clock, fired)
+    timers_by_label = {i: (delay, wheel.schedule(delay, fire, i))
+                       for i, delay in enumerate(rng.uniform(0, 90) for _ in range(300))}
+    cancelled = set(rng.sample(sorted(timers_by_label), 30))
+    run_until(wheel, clock, 10, step=0.3)
+    for label in cancelled:
+        timers_by_label[label][1].cancel()
+    run_until(wheel, clock, 100, step=0.3)
+    for label, (delay, _) in timers_by_label.items():
+        if label in cancelled and delay > 10 + wheel.tick:
+            assert label not in fired
+        elif label not in cancelled:
+            assert delay <= fired[label] < delay + wheel.tick + 0.3
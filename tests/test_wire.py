@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from state import SPLICE_MARK, Snapshot, WireJSON
+
+
+def snapshot(version, **payload):
+    return Snapshot(version, {"version": version, **payload})
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"ensure_ascii": False}, {"separators": (",", ":")}])
+def test_packet_with_two_snapshots(kwargs):
+    first, second = snapshot(3, room="café"), snapshot(4, players={"a": "🍕"})
+    packet = ["batch", [["game_state", first], ["game_reset", second], ["chat", "naïve"]]]
+    decoded = WireJSON.loads(WireJSON.dumps(packet, **kwargs))
+    assert decoded == ["batch", [["game_state", first.payload], ["game_reset", second.payload],
+                                 ["chat", "naïve"]]]
+
+
+def test_client_strings_that_look_like_the_mark_are_left_alone():
+    lookalikes = ["\u0000snapshot:0\u0000", SPLICE_MARK.split(":")[0] + ":%d" % 0,
+                  json.dumps("\u0000snapshot:"), "%d"]
+    packet = {"room": lookalikes, "state": snapshot(1, room="r"), "again": snapshot(2)}
+    decoded = WireJSON.loads(WireJSON.dumps(packet))
+    assert decoded == {"room": lookalikes, "state": {"version": 1, "room": "r"}, "again": {"version": 2}}
+
+
+def test_snapshot_is_encoded_once():
+    shared = snapshot(5, room="r")
+    first = WireJSON.dumps(["game_state", shared])
+    encoded = shared.encoded
+    assert WireJSON.dumps(["game_reset", shared]).endswith(encoded + "]")
+    assert shared.encoded is encoded and first.endswith(encoded + "]")
+
+
+def test_other_objects_still_fail():
+    with pytest.raises(TypeError):
+        WireJSON.dumps({"bad": object()})
@@ -0,0 +1,106 @@
+import asyncio
+import math
+import time
+
+
+class Timer:
+    __slots__ = ("due", "callback", "args", "name", "room", "slot")
+
+    def __init__(self, due, callback, args, name, room):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.name = name
+        self.room = room
+        self.slot = None
+
+    def cancel(self):
+        if self.slot is not None:
+            self.slot.discard(self)
+            self.slot = None
+
+    @property
+    def active(self):
+        return self.slot is not None
+
+
+class TimerWheel:
+    """Hierarchical timing wheel driving every deadline from a single loop.
+
+    Level 0 has `slots` buckets of `tick` seconds; each higher level's bucket spans a whole
+    rotation of the level below and is cascaded down when the wheel reaches it. Scheduling
+    and cancelling are O(1) set operations.
+    """
+
+    def __init__(self, tick=0.05, slots=64, levels=4, sleep=asyncio.sleep):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.sleep = sleep
+        self.wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.overflow = set()
+        self.started = time.time()
+        self.current = 0
+        self.running = False
+
+    def schedule(self, delay, callback, *args, name=None, room=None):
+        timer = Timer(time.time() + delay, callback, args, name or callback.__name__, room)
+        self._place(timer, self.current + 1)
+        return timer
+
+    def _place(self, timer, earliest):
+        ticks = max(math.ceil((timer.due - self.started) / self.tick), earliest)
+        for level in range(self.levels):
+            # Lowest level whose parent bucket also holds the current tick
+            if ticks // self.slots ** (level + 1) == self.current // self.slots ** (level + 1):
+                slot = self.wheels[level][(ticks // self.slots ** level) % self.slots]
+                break
+        else:
+            slot = self.overflow
+        slot.add(timer)
+        timer.slot = slot
+
+    def _advance(self):
+        self.current += 1
+        if self.current % self.slots ** self.levels == 0:
+            self._cascade(self.overflow)
+        for level in range(self.levels - 1, 0, -1):
+            span = self.slots ** level
+            if self.current % span == 0:
+                self._cascade(self.wheels[level][(self.current // span) % self.slots])
+        due = self.wheels[0][self.current % self.slots]
+        timers = list(due)
+        due.clear()
+        for timer in timers:
+            timer.slot = None
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"Timer {timer.name} for room {timer.room} failed: {e}")
+
+    def _cascade(self, slot):
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            self._place(timer, self.current)
+
+    def _catch_up(self):
+        # Fire every tick that has fully elapsed
+        target = int((time.time() - self.started) / self.tick)
+        while self.current < target:
+            self._advance()
+
+    async def run(self):
+        self.running = True
+        while self.running:
+            self._catch_up()
+            await self.sleep(max(0, self.started + (self.current + 1) * self.tick - time.time()))
+
+    def pending(self, room=None):
+        timers = [timer for level in self.wheels for slot in level for timer in slot]
+        timers.extend(self.overflow)
+        return sorted(
+            ({"name": t.name, "room": t.room, "due_in": round(t.due - time.time(), 2)}
+             for t in timers if room is None or t.room == room),
+            key=lambda t: t["due_in"]
+        )
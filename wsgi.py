@@ -1,6 +1,9 @@
 # run.py
+import os
 import eventlet
 #eventlet.monkey_patch()
+if os.environ.get("ROOM_STORE_URL") or os.environ.get("MESSAGE_QUEUE"):
+    eventlet.monkey_patch()  # Redis clients for the room store and message queue must not block the hub
 
 from main import app, socketio
 